@@ -0,0 +1,142 @@
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+
+from . import audit, sharding
+from .audit import audit_log, changed_fields
+from .authentication import CachedJWTAuthentication, exception_response
+from .conditional import cache_response, etag_matches, get_cached_response, list_etag, user_etag
+from .hashing import ahash_password
+from .instrumentation import timed
+from .models import CustomUser
+from .serializers import RegisterSerializer, UserSerializer, conflict_errors, row_serializer_for
+from .views import user_list_page
+
+
+def jwt_required(view):
+    """Authenticate an async view with CachedJWTAuthentication, setting request.user."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await CachedJWTAuthentication().aauthenticate(request)
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as exc:
+            return exception_response(exc)
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def parse_json(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+def not_modified(etag):
+    response = HttpResponse(status=304)
+    response['ETag'] = etag
+    return response
+
+
+def json_response(data, etag=None, status=200):
+    response = JsonResponse(data, status=status, safe=False)
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def register(request):
+    serializer = RegisterSerializer(data=parse_json(request))
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+    data = dict(serializer.validated_data)
+    password = data.pop('password')
+    data['email'] = CustomUser.objects.normalize_email(data['email'])
+    user = CustomUser(**data)
+    try:
+        user.password = await ahash_password(password)
+    except APIException as exc:
+        return exception_response(exc)
+    try:
+        if sharding.enabled():
+            await sync_to_async(sharding.save_new_user)(user)
+        else:
+            await user.asave()
+    except IntegrityError:
+        return JsonResponse(await sync_to_async(conflict_errors)(data), status=400)
+    audit_log.publish(audit.REGISTER, user.id)
+    return JsonResponse({'message': 'User registered successfully'}, status=201)
+
+
+@require_GET
+@jwt_required
+async def get_user_id(request):
+    return JsonResponse({'user_id': request.user.id})
+
+
+@require_GET
+@jwt_required
+async def user_list(request):
+    etag = list_etag(request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    data = get_cached_response(etag)
+    if data is None:
+        try:
+            data = await sync_to_async(user_list_page)(Request(request))
+        except APIException as exc:
+            # ValidationError for bad filters, NotFound for a malformed or backwards cursor
+            return exception_response(exc)
+        cache_response(etag, data)
+    return json_response(data, etag)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+@jwt_required
+async def user_detail(request, pk):
+    if request.method == 'GET':
+        try:
+            row_serializer = row_serializer_for(request.GET)
+        except ValidationError as exc:
+            return json_response(exc.detail, status=400)
+        etag = user_etag(pk, request.GET.get('fields'))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        data = get_cached_response(etag)
+        if data is None:
+            row = await CustomUser.objects.filter(id=pk).values(*row_serializer.fields).afirst()
+            if row is None:
+                return JsonResponse({'detail': 'Not found.'}, status=404)
+            with timed('serialize'):
+                data = row_serializer.to_representation([row])[0]
+            cache_response(etag, data)
+        return json_response(data, etag)
+
+    user = await CustomUser.objects.filter(id=pk).afirst()
+    if user is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    if request.method == 'DELETE':
+        await user.adelete()
+        audit_log.publish(audit.DELETE, pk, actor_id=request.user.id)
+        return JsonResponse({'message': 'User deleted successfully'}, status=204)
+
+    serializer = UserSerializer(user, data=parse_json(request))
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+    fields = changed_fields(user, serializer.validated_data)
+    await sync_to_async(serializer.save)()
+    audit_log.publish(audit.UPDATE, pk, actor_id=request.user.id, fields=fields)
+    return JsonResponse(serializer.data)
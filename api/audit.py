@@ -0,0 +1,184 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .db import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+REGISTER = 'register'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+class AuditPipeline:
+    """
+    Bounded in-memory queue of AuditEvent rows drained into the database by a
+    background thread, in one transaction per batch of up to `batch_size`
+    events. Publishing never waits on the database: when the queue is full it
+    blocks for at most `enqueue_timeout` seconds, then drops the event and
+    counts it. A batch that fails to write is retried, never reordered.
+    """
+
+    def __init__(self, max_size, interval, batch_size, enqueue_timeout):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout
+        self.background = True
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._unwritten = []
+        self.published = self.written = self.dropped = self.failures = 0
+        self.max_lag = 0.0
+
+    def publish(self, action, user_id, actor_id=None, fields=()):
+        """Queue an event; returns False when it was dropped because the queue stayed full."""
+        from .models import AuditEvent
+        event = AuditEvent(
+            action=action, user_id=user_id, actor_id=actor_id, fields=sorted(fields), created_at=timezone.now(),
+        )
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning('Audit queue full, dropped %s event for user %s', action, user_id)
+            return False
+        self.published += 1
+        if self.background:
+            self._ensure_thread()
+        return True
+
+    def pending(self):
+        return self._queue.qsize() + len(self._unwritten)
+
+    def lag(self):
+        """Seconds the oldest unwritten event has been waiting."""
+        with self._queue.mutex:
+            oldest = self._unwritten[0] if self._unwritten else (self._queue.queue[0] if self._queue.queue else None)
+        return (timezone.now() - oldest.created_at).total_seconds() if oldest else 0.0
+
+    def _ensure_thread(self):
+        # A forked worker does not inherit the parent's thread, so start one per process
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _take(self, timeout):
+        """Collect up to batch_size events, waiting at most `timeout` seconds for the first one."""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        # Keep filling the batch while the first event is younger than the flush interval
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                with self._flush_lock:
+                    if not self._unwritten:
+                        self._unwritten = self._take(min(self.interval, 1.0))
+                    if not self._unwritten:
+                        continue
+                    try:
+                        self._write(self._unwritten)
+                    except Exception:
+                        self.failures += 1
+                        logger.exception('Writing %d audit events failed', len(self._unwritten))
+                        failed = True
+                    else:
+                        self._unwritten = []
+                        failed = False
+                if failed:
+                    self._stop.wait(self.interval)
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        """Write every queued event now, in the calling thread. Returns the number of events written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                if not self._unwritten:
+                    self._unwritten = self._take(0)
+                if not self._unwritten:
+                    return written
+                self._write(self._unwritten)
+                written += len(self._unwritten)
+                self._unwritten = []
+
+    def close(self, timeout=5.0):
+        """Stop the background thread and drain whatever is still queued."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        return self.flush()
+
+    @retry_on_locked
+    def _write(self, batch):
+        from .models import AuditEvent
+        with transaction.atomic(using='default'):
+            AuditEvent.objects.using('default').bulk_create(batch, batch_size=self.batch_size)
+        self.written += len(batch)
+        self.max_lag = max(self.max_lag, (timezone.now() - batch[0].created_at).total_seconds())
+
+    def reset(self):
+        """Discard queued events and zero the counters."""
+        with self._flush_lock:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._unwritten = []
+            self.published = self.written = self.dropped = self.failures = 0
+            self.max_lag = 0.0
+
+    def stats(self):
+        return {
+            'published': self.published,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failures': self.failures,
+            'pending': self.pending(),
+            'lag_ms': round(self.lag() * 1000, 2),
+            'max_lag_ms': round(self.max_lag * 1000, 2),
+        }
+
+
+audit_log = AuditPipeline(
+    max_size=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+    interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0),
+    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 500),
+    enqueue_timeout=getattr(settings, 'AUDIT_ENQUEUE_TIMEOUT', 0.05),
+)
+atexit.register(audit_log.close)
+
+
+def changed_fields(instance, data):
+    """Names of the fields in `data` whose value differs from `instance`."""
+    return [field for field, value in data.items() if getattr(instance, field) != value]
@@ -0,0 +1,132 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import AUTH_HEADER_TYPES, JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import MISSING, LRUCache
+from .instrumentation import timed
+from .models import CustomUser
+from .revocation import revocations
+
+user_cache = LRUCache(
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+)
+
+
+def _shared_cache():
+    alias = getattr(settings, 'AUTH_USER_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_cached_user(user_id):
+    user = user_cache.get(user_id)
+    if user is MISSING:
+        shared = _shared_cache()
+        user = shared.get(_shared_key(user_id)) if shared else None
+        if user is None:
+            user = CustomUser.objects.filter(id=user_id).first()
+            if user is None:
+                return None
+            if shared:
+                shared.set(_shared_key(user_id), user, user_cache.ttl)
+        user_cache.set(user_id, user)
+    # Hand out a copy so per-request changes never leak into the cache
+    return copy.copy(user)
+
+
+async def aget_cached_user(user_id):
+    user = user_cache.get(user_id)
+    if user is MISSING:
+        shared = _shared_cache()
+        user = await shared.aget(_shared_key(user_id)) if shared else None
+        if user is None:
+            user = await CustomUser.objects.filter(id=user_id).afirst()
+            if user is None:
+                return None
+            if shared:
+                await shared.aset(_shared_key(user_id), user, user_cache.ttl)
+        user_cache.set(user_id, user)
+    return copy.copy(user)
+
+
+def invalidate_cached_user(user_id):
+    user_cache.delete(user_id)
+    shared = _shared_cache()
+    if shared:
+        shared.delete(_shared_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that rejects revoked tokens and resolves the token's
+    user through the user cache.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        revocations.sync_if_due()
+        revocations.check(validated_token)
+        return validated_token
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate(), returning (user, token) or None."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        with timed('auth'):
+            validated_token = super().get_validated_token(raw_token)
+            await revocations.async_sync_if_due()
+            revocations.check(validated_token)
+            user = await aget_cached_user(self.get_user_id(validated_token))
+            return self.check_user(user, validated_token), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, user, validated_token):
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def get_user(self, validated_token):
+        return self.check_user(get_cached_user(self.get_user_id(validated_token)), validated_token)
+
+
+def exception_response(exc):
+    """Render a DRF APIException for views and middleware that bypass DRF, as DRF's exception_handler does."""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if exc.status_code == 401:
+        response['WWW-Authenticate'] = f'{AUTH_HEADER_TYPES[0]} realm="api"'
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
@@ -0,0 +1,144 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max
+
+from . import sharding
+from .bloom import BloomFilter
+
+FIELDS = ('email', 'identity_number')
+
+
+class AvailabilityIndex:
+    """
+    In-process Bloom filter over every stored email and identity number, so a
+    value that was never registered is reported free without a query and only
+    possible hits are confirmed against the database. Loaded at startup by
+    warm() (the gunicorn master, before forking), then kept current from the
+    change sequence every REGISTRATION_AVAILABILITY_SYNC_INTERVAL seconds and
+    directly by writes in this process. Deletes leave stale bits behind, so a
+    worn-out filter is rebuilt on a background thread while requests keep
+    using the old one; until a first load finishes, every value is checked in
+    the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.background = True
+        self.reset()
+
+    def reset(self):
+        self._bloom = None
+        self._loader = None
+        self._last_seq = 0
+        self._synced_at = 0.0
+        self._deleted = 0
+        self.hits = self.misses = self.queries = 0
+
+    def _sources(self):
+        from .models import CustomUser
+        return [CustomUser.objects.using(alias) for alias in sharding.shards() or [None]]
+
+    def _build(self):
+        """A new filter holding every stored value, and the change sequence it is current to."""
+        count = sum(queryset.count() for queryset in self._sources())
+        capacity = max(getattr(settings, 'REGISTRATION_AVAILABILITY_CAPACITY', 100000), count * 2)
+        bloom = BloomFilter(capacity, getattr(settings, 'REGISTRATION_AVAILABILITY_ERROR_RATE', 0.01))
+        last_seq = 0
+        for queryset in self._sources():
+            last_seq = max(last_seq, queryset.aggregate(Max('change_seq'))['change_seq__max'] or 0)
+            for email, identity_number in queryset.values_list(*FIELDS).iterator(chunk_size=5000):
+                bloom.add(f'email:{email}')
+                bloom.add(f'identity_number:{identity_number}')
+        return bloom, last_seq
+
+    def _sync(self):
+        for queryset in self._sources():
+            rows = queryset.filter(change_seq__gt=self._last_seq).values_list('change_seq', *FIELDS)
+            for change_seq, email, identity_number in rows:
+                self._bloom.add(f'email:{email}')
+                self._bloom.add(f'identity_number:{identity_number}')
+                self._last_seq = max(self._last_seq, change_seq)
+        self._synced_at = time.monotonic()
+
+    def warm(self):
+        """Load the filter now; values written while it was built are pulled in before it is used."""
+        bloom, last_seq = self._build()
+        with self._lock:
+            self._bloom, self._last_seq, self._deleted = bloom, last_seq, 0
+            self._sync()
+
+    def _rebuild(self):
+        try:
+            self.warm()
+        finally:
+            connections.close_all()
+            self._loader = None
+
+    def worn_out(self):
+        bloom = self._bloom
+        return bloom is None or bloom.count > bloom.capacity or self._deleted * 4 > bloom.count
+
+    def refresh(self):
+        """Rebuild the filter once it is missing or worn out, otherwise pull new values when a sync is due."""
+        if self.worn_out():
+            if not self.background:
+                self.warm()
+                return
+            with self._lock:
+                if self._loader is None:
+                    self._loader = threading.Thread(target=self._rebuild, name='availability-rebuild', daemon=True)
+                    self._loader.start()
+        if self._bloom is not None and self._sync_due():
+            with self._lock:
+                # Threads that waited here find the sync already done
+                if self._sync_due():
+                    self._sync()
+
+    def _sync_due(self):
+        return time.monotonic() - self._synced_at >= getattr(settings, 'REGISTRATION_AVAILABILITY_SYNC_INTERVAL', 1.0)
+
+    def add(self, email, identity_number):
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(f'email:{email}')
+            bloom.add(f'identity_number:{identity_number}')
+
+    def discard(self):
+        self._deleted += 2
+
+    def might_exist(self, field, value):
+        """False when no user holds `value` in `field`; True means it has to be checked in the database."""
+        self.refresh()
+        bloom = self._bloom
+        if bloom is None:
+            # Not loaded yet: the database answers
+            return True
+        if f'{field}:{value}' in bloom:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def is_taken(self, field, value):
+        """Whether a user holds `value` in `field`; queries only when the filter reports a possible hit."""
+        from .models import CustomUser
+        if not self.might_exist(field, value):
+            return False
+        self.queries += 1
+        return CustomUser.objects.filter(**{field: value}).exists()
+
+    def stats(self):
+        bloom = self._bloom
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'queries': self.queries,
+            'size': bloom.count if bloom else 0,
+            'capacity': bloom.capacity if bloom else 0,
+        }
+
+
+availability = AvailabilityIndex()
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from . import audit, changes, sharding
+from .audit import audit_log, changed_fields
+from .db import retry_on_locked
+from .models import CustomUser, UserDirectory
+from .serializers import UserSerializer
+from .signals import invalidate_user_caches
+
+BATCH_MAX_ITEMS = getattr(settings, 'USER_BATCH_MAX_ITEMS', 500)
+UNIQUE_FIELDS = ('email', 'identity_number')
+NOT_FOUND = 'Not found.'
+
+
+def parse_ids(value):
+    """Parse the comma separated `ids` query parameter, keeping the caller's order. Raises ValidationError."""
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise serializers.ValidationError({'ids': ['Expected a comma separated list of user ids.']})
+    if not ids:
+        raise serializers.ValidationError({'ids': ['This parameter is required.']})
+    if len(ids) > BATCH_MAX_ITEMS:
+        raise serializers.ValidationError({'ids': [f'At most {BATCH_MAX_ITEMS} ids can be requested at once.']})
+    return ids
+
+
+def _querysets(ids):
+    """One id__in queryset for `ids`, or one per shard holding any of them."""
+    if not sharding.enabled():
+        return [CustomUser.objects.filter(id__in=ids)]
+    by_shard = {}
+    for user_id in ids:
+        by_shard.setdefault(sharding.shard_for_id(user_id), []).append(user_id)
+    return [CustomUser.objects.using(alias).filter(id__in=shard_ids) for alias, shard_ids in by_shard.items()]
+
+
+def get_users(ids, row_serializer):
+    """Per-id results for `ids`, read with one id__in query per database."""
+    rows = {row['id']: row for queryset in _querysets(set(ids)) for row in queryset.values('id', *row_serializer.fields)}
+    users = dict(zip(rows, row_serializer.to_representation(rows.values())))
+    return [
+        {'id': user_id, 'status': 200, 'user': users[user_id]} if user_id in users
+        else {'id': user_id, 'status': 404, 'detail': NOT_FOUND}
+        for user_id in ids
+    ]
+
+
+def validate_items(items):
+    """
+    Validate each `{'id': ..., <fields>}` item against its user with
+    UserSerializer(partial=True), returning the per-item results and the
+    serializers of the items that passed.
+    """
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    wanted = {user_id for user_id in ids if isinstance(user_id, int) and not isinstance(user_id, bool)}
+    users = {user.id: user for queryset in _querysets(wanted) for user in queryset} if wanted else {}
+    results, valid, seen = [], [], {'id': set(), **{field: set() for field in UNIQUE_FIELDS}}
+    for item, user_id in zip(items, ids):
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            results.append({'id': user_id, 'status': 400, 'errors': {'id': ['A valid user id is required.']}})
+            continue
+        if user_id in seen['id']:
+            results.append({'id': user_id, 'status': 400, 'errors': {'id': ['Duplicate id in this batch.']}})
+            continue
+        seen['id'].add(user_id)
+        if user_id not in users:
+            results.append({'id': user_id, 'status': 404, 'detail': NOT_FOUND})
+            continue
+        data = {key: value for key, value in item.items() if key != 'id'}
+        serializer = UserSerializer(users[user_id], data=data, partial=True)
+        if not serializer.is_valid():
+            results.append({'id': user_id, 'status': 400, 'errors': serializer.errors})
+            continue
+        clashes = {
+            field: ['Another item in this batch uses this value.']
+            for field in UNIQUE_FIELDS
+            if field in serializer.validated_data and serializer.validated_data[field] in seen[field]
+        }
+        if clashes:
+            results.append({'id': user_id, 'status': 400, 'errors': clashes})
+            continue
+        for field in UNIQUE_FIELDS:
+            if field in serializer.validated_data:
+                seen[field].add(serializer.validated_data[field])
+        results.append({'id': user_id, 'status': 200})
+        valid.append((results[-1], serializer))
+    return results, valid
+
+
+@retry_on_locked
+def write_users(users, fields):
+    """bulk_update `fields` of `users` in one transaction per database, keeping the shard directory in step."""
+    if not sharding.enabled():
+        changes.bulk_update(users, fields)
+        return
+    by_shard = {}
+    for user in users:
+        by_shard.setdefault(sharding.shard_for_id(user.id), []).append(user)
+    directory_fields = [field for field in UNIQUE_FIELDS if field in fields]
+    # The directory update rolls back if a shard write fails
+    with transaction.atomic(using='default'):
+        if directory_fields:
+            entries = list(UserDirectory.objects.using('default').filter(user_id__in=[user.id for user in users]))
+            by_user = {user.id: user for user in users}
+            for entry in entries:
+                for field in directory_fields:
+                    setattr(entry, field, getattr(by_user[entry.user_id], field))
+            UserDirectory.objects.using('default').bulk_update(entries, directory_fields)
+        for alias, shard_users in by_shard.items():
+            changes.bulk_update(shard_users, fields, using=alias)
+
+
+def update_users(items, row_serializer, actor_id=None):
+    """Apply the valid items of a batch partial update, returning per-item results."""
+    results, valid = validate_items(items)
+    if not valid:
+        return results
+    users, fields, changed = [], set(), []
+    for result, serializer in valid:
+        changed.append(changed_fields(serializer.instance, serializer.validated_data))
+        for field, value in serializer.validated_data.items():
+            setattr(serializer.instance, field, value)
+        fields.update(serializer.validated_data)
+        users.append(serializer.instance)
+    if fields:
+        try:
+            write_users(users, sorted(fields))
+        except IntegrityError:
+            # Another writer took one of these values after validation ran
+            for result, _ in valid:
+                result.update(status=409, errors={
+                    'non_field_errors': ['A conflicting change was made concurrently, retry this item.']
+                })
+            return results
+        # bulk_update sends no post_save, so cached copies are dropped here
+        for user in users:
+            invalidate_user_caches(CustomUser, user)
+    for user, user_fields in zip(users, changed):
+        audit_log.publish(audit.UPDATE, user.id, actor_id=actor_id, fields=user_fields)
+    rows = ({field: getattr(user, field) for field in row_serializer.fields} for user in users)
+    for (result, _), data in zip(valid, row_serializer.to_representation(rows)):
+        result['user'] = data
+    return results
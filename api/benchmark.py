@@ -0,0 +1,144 @@
+import datetime
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import changes
+from .conditional import bump_table_version
+from .models import CustomUser
+
+BENCH_PASSWORD = '1BenchPassword!'
+BENCH_EMAIL_DOMAIN = 'bench.example.com'
+TOKEN_POOL_SIZE = 100
+
+
+def load_mix(path):
+    with open(path, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def seed_users(count):
+    """Insert `count` users sharing one password hash, so seeding is not bound by PBKDF2."""
+    password = make_password(BENCH_PASSWORD)
+    changes.bulk_create([
+        CustomUser(
+            name=f'Bench User {i}',
+            email=f'seed{i}@{BENCH_EMAIL_DOMAIN}',
+            password=password,
+            identity_number=f'SEED{i:010d}',
+            date_of_birth=datetime.date(1950, 1, 1) + datetime.timedelta(days=i % 20000),
+        )
+        for i in range(count)
+    ], batch_size=1000, ignore_conflicts=True)
+    bump_table_version()
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+class Replayer:
+    """
+    Sends the entries of a request mix to `base_url`. String values in an
+    entry may use {seq} (unique per request), {user_id}, {email} and
+    {identity_number} (a random seeded user) placeholders; entries with "auth": true send a bearer token.
+    """
+
+    def __init__(self, base_url, mix):
+        self.base_url = base_url.rstrip('/')
+        self.mix = mix
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        users = list(CustomUser.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')[:TOKEN_POOL_SIZE])
+        if not users:
+            raise ValueError('No seeded users to replay requests as')
+        self.users = [(user.id, user.email, user.identity_number, str(AccessToken.for_user(user))) for user in users]
+
+    def render(self, value, context):
+        if isinstance(value, str):
+            return value.format(**context)
+        if isinstance(value, dict):
+            return {key: self.render(item, context) for key, item in value.items()}
+        return value
+
+    def send(self, entry):
+        with self.lock:
+            seq = next(self.sequence)
+        user_id, email, identity_number, token = random.choice(self.users)
+        context = {'seq': seq, 'user_id': user_id, 'email': email, 'identity_number': identity_number}
+        body = entry.get('body')
+        request = urllib.request.Request(
+            self.base_url + self.render(entry['path'], context),
+            data=json.dumps(self.render(body, context)).encode() if body is not None else None,
+            method=entry.get('method', 'GET'),
+            headers={'Content-Type': 'application/json'},
+        )
+        if entry.get('auth'):
+            request.add_header('Authorization', f'Bearer {token}')
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        return entry['name'], status, time.perf_counter() - started
+
+    def run(self, total_requests, concurrency):
+        entries = [self.mix[i % len(self.mix)] for i in range(total_requests)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(self.send, entries))
+        return summarize(results, time.perf_counter() - started)
+
+
+def summarize(results, wall_time):
+    by_name = defaultdict(list)
+    errors = defaultdict(int)
+    for name, status, elapsed in results:
+        by_name[name].append(elapsed * 1000)
+        if status >= 400:
+            errors[name] += 1
+
+    summary = {}
+    for name, latencies in sorted(by_name.items()):
+        latencies.sort()
+        summary[name] = {
+            'requests': len(latencies),
+            'errors': errors[name],
+            'throughput': round(len(latencies) / wall_time, 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+        }
+    return summary
+
+
+def find_regressions(summary, baseline, tolerance):
+    """Compare a summary against a stored one, returning a message per regressed endpoint."""
+    regressions = []
+    for name, base in baseline.items():
+        current = summary.get(name)
+        if current is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['throughput']} req/s vs baseline {base['throughput']} req/s")
+        if current['errors'] > base['errors']:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
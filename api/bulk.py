@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q
+
+from . import audit, changes, sharding
+from .audit import audit_log
+from .availability import availability
+from .conditional import bump_table_version
+from .db import retry_on_locked
+from .hashing import hash_passwords
+from .models import CustomUser, UserDirectory
+from .serializers import UNIQUE_FIELDS, RegisterSerializer, unique_error
+
+BULK_REGISTER_BATCH_SIZE = getattr(settings, 'BULK_REGISTER_BATCH_SIZE', 500)
+
+
+class BulkRegisterSerializer(RegisterSerializer):
+    # Uniqueness is checked once per batch in find_conflicts instead of per record
+
+    def validate_email(self, value):
+        return value
+
+    def validate_identity_number(self, value):
+        return value
+
+
+def validate_record(record):
+    serializer = BulkRegisterSerializer(data=record)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    data = dict(serializer.validated_data)
+    data['email'] = CustomUser.objects.normalize_email(data['email'])
+    return data, None
+
+
+def find_conflicts(batch, seen):
+    """
+    Split a batch of (index, data) pairs into accepted records and per-index errors.
+
+    One query finds rows already holding any of the batch's emails or identity
+    numbers that the availability index cannot rule out, and is skipped when
+    it rules out all of them; `seen` carries values accepted earlier in the
+    same upload so duplicates inside the upload are rejected too.
+    """
+    lookup = Q()
+    for field in UNIQUE_FIELDS:
+        candidates = {data[field] for _, data in batch if availability.might_exist(field, data[field])}
+        if candidates:
+            lookup |= Q(**{f'{field}__in': candidates})
+    # With sharding the directory on the default database is the one place that knows every value
+    source = UserDirectory.objects.using('default') if sharding.enabled() else CustomUser.objects
+    rows = source.filter(lookup).values_list(*UNIQUE_FIELDS) if lookup else []
+    for row in rows:
+        for field, value in zip(UNIQUE_FIELDS, row):
+            seen[field].add(value)
+
+    accepted, errors = [], {}
+    for index, data in batch:
+        error = {field: [unique_error(field)] for field in UNIQUE_FIELDS if data[field] in seen[field]}
+        if error:
+            errors[index] = error
+            continue
+        for field in UNIQUE_FIELDS:
+            seen[field].add(data[field])
+        accepted.append((index, data))
+    return accepted, errors
+
+
+@retry_on_locked
+def insert_batch(users):
+    if sharding.enabled():
+        sharding.bulk_insert(users)
+        return
+    changes.bulk_create(users)
+
+
+def bulk_register(records, batch_size=None, actor_id=None):
+    """
+    Validate, hash and insert `records`, returning the created count and a dict
+    of errors keyed by the record's position in `records`.
+    """
+    batch_size = batch_size or BULK_REGISTER_BATCH_SIZE
+    valid, errors = [], {}
+    for index, record in enumerate(records):
+        data, error = validate_record(record)
+        if error:
+            errors[index] = error
+        else:
+            valid.append((index, data))
+
+    created = 0
+    seen = {field: set() for field in UNIQUE_FIELDS}
+    for start in range(0, len(valid), batch_size):
+        batch, batch_errors = find_conflicts(valid[start:start + batch_size], seen)
+        errors.update(batch_errors)
+        passwords = hash_passwords(data['password'] for _, data in batch)
+        users = [CustomUser(**{**data, 'password': password}) for (_, data), password in zip(batch, passwords)]
+        try:
+            insert_batch(users)
+        except IntegrityError:
+            # Another writer took one of these values after find_conflicts ran
+            for index, _ in batch:
+                errors[index] = {'non_field_errors': ['A conflicting user was created concurrently, retry this record.']}
+            continue
+        for user in users:
+            audit_log.publish(audit.REGISTER, user.id, actor_id=actor_id)
+        created += len(users)
+    if created:
+        # bulk_create sends no post_save, so cached list pages are invalidated here
+        bump_table_version()
+    return created, errors
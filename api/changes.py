@@ -0,0 +1,132 @@
+import heapq
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from rest_framework import serializers
+
+from . import demographics, sharding
+
+SEQUENCE_NAME = 'user_changes'
+# Saves that only touch these fields are not reported to sync clients
+UNTRACKED_FIELDS = frozenset({'last_login'})
+
+
+@contextmanager
+def sequence_lock(using=None):
+    """
+    Hold the change sequence row on the default database until the writes made
+    on `using` inside the block have committed, so sequence numbers become
+    visible to readers in order and a sync cursor never skips a change.
+    """
+    with transaction.atomic(using='default'), transaction.atomic(using=using or 'default'):
+        yield
+
+
+def _highest_seq():
+    from .models import CustomUser, UserTombstone
+    highest = 0
+    for alias in sharding.shards() or ['default']:
+        for model in (CustomUser, UserTombstone):
+            highest = max(highest, model.objects.using(alias).aggregate(Max('change_seq'))['change_seq__max'] or 0)
+    return highest
+
+
+def reserve(count):
+    """Take the next `count` change sequence numbers; call inside sequence_lock."""
+    from .models import ShardSequence
+    sequence = ShardSequence.objects.using('default').select_for_update().filter(name=SEQUENCE_NAME).first()
+    if sequence is None:
+        sequence = ShardSequence(name=SEQUENCE_NAME, next_value=_highest_seq() + 1)
+    start = sequence.next_value
+    sequence.next_value = start + count
+    sequence.save(using='default')
+    return range(start, start + count)
+
+
+def tracks(update_fields):
+    return update_fields is None or not UNTRACKED_FIELDS.issuperset(update_fields)
+
+
+def bulk_create(users, using=None, **kwargs):
+    """
+    CustomUser.objects.bulk_create(users) with every user stamped with a change
+    sequence number and counted in the demographics summary.
+    """
+    from .models import CustomUser
+    if kwargs.get('update_fields'):
+        kwargs['update_fields'] = [*kwargs['update_fields'], 'change_seq']
+    conflicts = kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')
+    with sequence_lock(using):
+        for user, seq in zip(users, reserve(len(users))):
+            user.change_seq = seq
+        replaced = []
+        if kwargs.get('update_conflicts'):
+            replaced = demographics.replaced_keys(users, using, kwargs['unique_fields'])
+        created = CustomUser.objects.using(using).bulk_create(users, **kwargs)
+        demographics.record_bulk_create(users, using, conflicts, replaced)
+        return created
+
+
+def bulk_update(users, fields, using=None):
+    """CustomUser.objects.bulk_update(users, fields) with every user stamped with a change sequence number."""
+    from .models import CustomUser
+    with sequence_lock(using):
+        for user, seq in zip(users, reserve(len(users))):
+            user.change_seq = seq
+        updated = CustomUser.objects.using(using).bulk_update(users, [*fields, 'change_seq'])
+        demographics.record_bulk_update(users, fields)
+        return updated
+
+
+def record_delete(user, using):
+    from .models import UserTombstone
+    with sequence_lock(using):
+        UserTombstone.objects.using(using).create(user_id=user.pk, change_seq=reserve(1)[0])
+
+
+class SyncParamsSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(min_value=0, default=0)
+    page_size = serializers.IntegerField(min_value=1, required=False)
+
+
+def changes_since(cursor, limit, fields):
+    """
+    The first `limit` changes with a sequence number above `cursor`, oldest
+    first, plus whether more follow. Each change is a `values()` row of the
+    user with `fields`, or a tombstone row with `deleted` set.
+    """
+    from .models import CustomUser, UserTombstone
+    per_source = []
+    for alias in sharding.shards() or [None]:
+        users = CustomUser.objects.using(alias).filter(change_seq__gt=cursor).order_by('change_seq')
+        tombstones = UserTombstone.objects.using(alias).filter(change_seq__gt=cursor).order_by('change_seq')
+        per_source.append(users.values('id', 'change_seq', *fields)[:limit + 1])
+        per_source.append(
+            {'id': row['user_id'], 'change_seq': row['change_seq'], 'deleted': True}
+            for row in tombstones.values('user_id', 'change_seq')[:limit + 1]
+        )
+    rows = list(islice(heapq.merge(*per_source, key=lambda row: row['change_seq']), limit + 1))
+    return rows[:limit], len(rows) > limit
+
+
+def sync_page(params, row_serializer):
+    """Validate the sync query parameters and build the response body."""
+    serializer = SyncParamsSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    cursor = serializer.validated_data['cursor']
+    limit = min(
+        serializer.validated_data.get('page_size', getattr(settings, 'USER_SYNC_PAGE_SIZE', 500)),
+        getattr(settings, 'USER_SYNC_MAX_PAGE_SIZE', 5000),
+    )
+    rows, more = changes_since(cursor, limit, row_serializer.fields)
+    upserts = iter(row_serializer.to_representation(row for row in rows if 'deleted' not in row))
+    changes = []
+    for row in rows:
+        change = {'seq': row['change_seq'], 'id': row['id'], 'deleted': 'deleted' in row}
+        if not change['deleted']:
+            change['user'] = next(upserts)
+        changes.append(change)
+    return {'changes': changes, 'cursor': rows[-1]['change_seq'] if rows else cursor, 'more': more}
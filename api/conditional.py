@@ -0,0 +1,77 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import routers
+
+TABLE_VERSION_KEY = 'users:version'
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _user_version_key(pk):
+    return f'user:{pk}:version'
+
+
+def _get_version(key):
+    cache = _cache()
+    # Seed with a timestamp so a version evicted from the cache never repeats an old ETag
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def _bump_version(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_user_version(pk):
+    _bump_version(_user_version_key(pk))
+    _bump_version(TABLE_VERSION_KEY)
+
+
+def bump_table_version():
+    _bump_version(TABLE_VERSION_KEY)
+
+
+def user_etag(pk, fields=None):
+    """ETag of user `pk`'s detail response, told apart per `fields` query parameter when one is given."""
+    etag = f'user-{pk}-{_get_version(_user_version_key(pk))}'
+    if fields:
+        etag += '-' + hashlib.sha1(fields.encode()).hexdigest()[:8]
+    return f'"{etag}"'
+
+
+def list_etag(request):
+    digest = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()[:16]
+    return f'"users-{_get_version(TABLE_VERSION_KEY)}-{digest}"'
+
+
+def etag_matches(request, etag):
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+def get_cached_response(etag):
+    return _cache().get(f'response:{etag}')
+
+
+def cache_response(etag, data):
+    # A replica can lag behind the version in `etag`; its rows would be served under it until the TTL
+    if routers.reads_from_replica():
+        return
+    _cache().set(f'response:{etag}', data, getattr(settings, 'USER_RESPONSE_CACHE_TTL', 300))
@@ -0,0 +1,110 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .audit import audit_log
+from .authentication import user_cache
+from .availability import availability
+from .revocation import revocations
+from .writebehind import last_login_buffer
+
+
+@pytest.fixture(autouse=True)
+def idle_write_behind(monkeypatch):
+    """Keep the write-behind thread from flushing mid-test; tests flush explicitly."""
+    monkeypatch.setattr(last_login_buffer, 'interval', None)
+    monkeypatch.setattr(last_login_buffer, 'max_size', float('inf'))
+    yield
+    for user_id in last_login_buffer.pending():
+        last_login_buffer.discard(user_id)
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocations(settings):
+    """
+    Rolled back tests reuse user ids, so revocations must not outlive a test.
+    Periodic syncs are off so query counts stay exact; tests sync explicitly.
+    """
+    settings.TOKEN_REVOCATION_SYNC_INTERVAL = float('inf')
+    revocations.reset()
+    yield
+    revocations.reset()
+
+
+@pytest.fixture(autouse=True)
+def fresh_availability(monkeypatch):
+    """The index is loaded from each test's own database on first use, inline so it sees the test's rows."""
+    monkeypatch.setattr(availability, 'background', False)
+    availability.reset()
+    yield
+    availability.reset()
+
+
+@pytest.fixture(autouse=True)
+def idle_audit_log(monkeypatch):
+    """Keep audit events queued during a test; tests flush explicitly."""
+    monkeypatch.setattr(audit_log, 'background', False)
+    audit_log.reset()
+    yield
+    audit_log.reset()
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    """
+    Rolled back tests reuse user ids, and cache invalidation waits for a commit
+    that never comes, so cached users, versions and responses must not outlive a test.
+    """
+    cache.clear()
+    user_cache.clear()
+    yield
+    cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_data():
+    return {
+        'name': 'Test User',
+        'email': 'testuser@email.com',
+        'password': '1TestPassword!',
+        'identity_number': '12345678901',
+        'date_of_birth': '2000-01-01'
+    }
+
+
+@pytest.fixture
+def create_user(user_data):
+    return get_user_model().objects.create_user(**user_data)
+
+
+@pytest.fixture
+def make_user():
+    """Create numbered users, e.g. make_user(1, 'sync') is sync1@email.com."""
+    def make(number, prefix='user', **fields):
+        return get_user_model().objects.create_user(**{
+            'email': f'{prefix}{number}@email.com',
+            'password': '1TestPassword!',
+            'name': f'{prefix.capitalize()} User {number}',
+            'identity_number': f'{number:011d}',
+            'date_of_birth': '2000-01-01',
+            **fields,
+        })
+    return make
+
+
+@pytest.fixture
+def client_for():
+    """Build an APIClient that sends the user's access token, or the given one."""
+    def build(user, token=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token or AccessToken.for_user(user)}')
+        return client
+    return build
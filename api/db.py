@@ -0,0 +1,22 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+
+def retry_on_locked(func):
+    """Retry `func` with jittered exponential backoff while SQLite reports the database as locked."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, 'DATABASE_LOCKED_RETRIES', 3)
+        backoff = getattr(settings, 'DATABASE_LOCKED_BACKOFF', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if 'locked' not in str(exc) or attempt == retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
@@ -0,0 +1,186 @@
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import sharding
+
+BIRTH_DATE = 'birth_date'
+SIGNUP_DATE = 'signup_date'
+UNKNOWN = ''
+# Length of the ISO date prefix each signup period groups by
+SIGNUP_PERIODS = {'day': 10, 'month': 7, 'year': 4}
+# Rows per upsert statement, well under SQLite's bound parameter limit
+UPSERT_BATCH_SIZE = 300
+# Values per IN lookup, for the same reason
+LOOKUP_BATCH_SIZE = 900
+
+
+def user_key(user):
+    """The (birth date, signup date) buckets `user` is counted in, or None when either field was not loaded."""
+    from .models import CustomUser
+    if 'date_of_birth' not in user.__dict__ or 'date_joined' not in user.__dict__:
+        return None
+    born = CustomUser._meta.get_field('date_of_birth').to_python(user.date_of_birth)
+    joined = user.date_joined
+    return (born.isoformat() if born else UNKNOWN, timezone.localdate(joined).isoformat() if joined else UNKNOWN)
+
+
+def tally(counts, keys, sign):
+    for born, joined in keys:
+        counts[BIRTH_DATE, born] += sign
+        counts[SIGNUP_DATE, joined] += sign
+    return counts
+
+
+def apply(counts):
+    """Add `counts`, a {(dimension, bucket): delta} mapping, to UserStat on the default database."""
+    from .models import UserStat
+    rows = [(dimension, bucket, delta) for (dimension, bucket), delta in counts.items() if delta]
+    if not rows:
+        return
+    connection = connections['default']
+    table = connection.ops.quote_name(UserStat._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} (dimension, bucket, count) VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT (dimension, bucket) DO UPDATE SET count = {table}.count + excluded.count',
+                [value for row in batch for value in row],
+            )
+
+
+def record_save(user, created):
+    """Count a new user, or move a saved one to its new buckets; runs inside the write's transaction."""
+    key, previous = user_key(user), getattr(user, '_stat_key', None)
+    counts = Counter()
+    if created:
+        tally(counts, [key], 1)
+    elif previous is not None and key is not None and key != previous:
+        tally(counts, [previous], -1)
+        tally(counts, [key], 1)
+    apply(counts)
+    user._stat_key = key
+
+
+def record_delete(user):
+    key = getattr(user, '_stat_key', None) or user_key(user)
+    if key is not None:
+        apply(tally(Counter(), [key], -1))
+
+
+def replaced_keys(users, using, unique_fields):
+    """Buckets of the stored rows an upsert of `users` on `unique_fields` will overwrite."""
+    from .models import CustomUser
+    field = unique_fields[0]
+    values = [getattr(user, field) for user in users]
+    rows = CustomUser.objects.using(using).only('date_of_birth', 'date_joined')
+    return [
+        user_key(row)
+        for start in range(0, len(values), LOOKUP_BATCH_SIZE)
+        for row in rows.filter(**{f'{field}__in': values[start:start + LOOKUP_BATCH_SIZE]})
+    ]
+
+
+def record_bulk_create(users, using, conflicts=False, replaced=()):
+    """
+    Count users written by changes.bulk_create, minus the `replaced` rows of
+    an upsert. When conflicts were skipped or updated, the rows that were
+    actually written are the ones carrying this batch's sequence numbers,
+    which were reserved as one block, so a range finds them in one query.
+    """
+    from .models import CustomUser
+    if conflicts and users:
+        seqs = [user.change_seq for user in users]
+        rows = CustomUser.objects.using(using).filter(change_seq__range=(min(seqs), max(seqs)))
+        keys = [user_key(row) for row in rows.only('date_of_birth', 'date_joined')]
+    else:
+        keys = [user_key(user) for user in users]
+    apply(tally(tally(Counter(), replaced, -1), keys, 1))
+    for user in users:
+        user._stat_key = user_key(user)
+
+
+def record_bulk_update(users, fields):
+    if not {'date_of_birth', 'date_joined'} & set(fields):
+        return
+    counts = Counter()
+    for user in users:
+        key, previous = user_key(user), getattr(user, '_stat_key', None)
+        if previous is not None and key != previous:
+            tally(counts, [previous], -1)
+            tally(counts, [key], 1)
+        user._stat_key = key
+    apply(counts)
+
+
+def rebuild():
+    """Recount every bucket from the users table(s). Returns the number of users counted."""
+    from .changes import sequence_lock
+    from .models import CustomUser, UserStat
+    # Holding the change sequence keeps writers out until the new counts are in place
+    with sequence_lock():
+        counts = Counter()
+        for alias in sharding.shards() or [None]:
+            users = CustomUser.objects.using(alias).order_by()
+            for born, count in users.values_list('date_of_birth').annotate(count=Count('id')):
+                counts[BIRTH_DATE, born.isoformat()] += count
+            joined_days = users.annotate(day=TruncDate('date_joined')).values_list('day').annotate(count=Count('id'))
+            for day, count in joined_days:
+                counts[SIGNUP_DATE, day.isoformat() if day else UNKNOWN] += count
+        UserStat.objects.using('default').all().delete()
+        UserStat.objects.using('default').bulk_create([
+            UserStat(dimension=dimension, bucket=bucket, count=count)
+            for (dimension, bucket), count in counts.items() if count
+        ], batch_size=1000)
+    return sum(count for (dimension, _), count in counts.items() if dimension == BIRTH_DATE)
+
+
+def age_bands():
+    """Labels and lower bounds of the age bands from USER_STATS_AGE_BANDS."""
+    bounds = [0, *getattr(settings, 'USER_STATS_AGE_BANDS', [18, 25, 35, 45, 55, 65])]
+    bands = [(f'{low}-{high - 1}', low) for low, high in zip(bounds, bounds[1:])]
+    return [*bands, (f'{bounds[-1]}+', bounds[-1])]
+
+
+def age_on(born, today):
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+class StatsParamsSerializer(serializers.Serializer):
+    signup_period = serializers.ChoiceField(choices=list(SIGNUP_PERIODS), default='month')
+
+
+def summary(params, today=None):
+    """Users by birth year, age band and signup period, from the UserStat buckets alone."""
+    from .models import UserStat
+    serializer = StatsParamsSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    length = SIGNUP_PERIODS[serializer.validated_data['signup_period']]
+    today = today or timezone.localdate()
+    bands = age_bands()
+
+    total = 0
+    birth_years, by_band, signups = Counter(), dict.fromkeys((label for label, _ in bands), 0), Counter()
+    rows = UserStat.objects.using('default').filter(count__gt=0).values_list('dimension', 'bucket', 'count')
+    for dimension, bucket, count in rows:
+        if dimension == SIGNUP_DATE:
+            signups[bucket[:length] or 'unknown'] += count
+            continue
+        born = datetime.date.fromisoformat(bucket)
+        age = age_on(born, today)
+        total += count
+        birth_years[bucket[:4]] += count
+        by_band[next(label for label, low in reversed(bands) if age >= low or low == 0)] += count
+    return {
+        'total': total,
+        'birth_years': dict(sorted(birth_years.items())),
+        'age_bands': by_band,
+        'signups': dict(sorted(signups.items(), key=lambda item: (item[0] == 'unknown', item[0]))),
+    }
@@ -0,0 +1,50 @@
+import csv
+import json
+
+from django.conf import settings
+
+from . import sharding
+from .models import CustomUser
+from .serializers import UserSerializer
+
+EXPORT_FIELDS = UserSerializer.Meta.fields
+EXPORT_CHUNK_SIZE = getattr(settings, 'USER_EXPORT_CHUNK_SIZE', 2000)
+
+
+class Echo:
+    """File-like object that hands written rows straight back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_user_rows():
+    if sharding.enabled():
+        rows = sharding.iter_all_rows(EXPORT_FIELDS, EXPORT_CHUNK_SIZE)
+    else:
+        rows = CustomUser.objects.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+def _encode(row):
+    row['date_of_birth'] = row['date_of_birth'].isoformat()
+    return row
+
+
+def stream_ndjson():
+    for row in iter_user_rows():
+        yield json.dumps(_encode(row)) + '\n'
+
+
+def stream_csv():
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in iter_user_rows():
+        yield writer.writerow(_encode(row))
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .hashing import run
+from .instrumentation import timed
+
+
+def _encode(password, salt, iterations):
+    return PBKDF2PasswordHasher().encode(password, salt, iterations)
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2PasswordHasher that runs in the hashing pool and reports its time to
+    the performance middleware. PASSWORD_HASHING_ITERATIONS overrides the
+    iteration count; Django rehashes older hashes on the next successful login.
+    """
+
+    iterations = getattr(settings, 'PASSWORD_HASHING_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        # verify() and harden_runtime() both go through encode, so this covers them too
+        with timed('hash'):
+            return run(_encode, password, salt, iterations or self.iterations)
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .instrumentation import timed
+
+_executor = None
+_slots = None
+_in_worker = False
+_stats_lock = threading.Lock()
+_stats = {'in_flight': 0, 'completed': 0, 'rejected': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Password hashing is busy, retry shortly.'
+    default_code = 'hashing_busy'
+    wait = 1
+
+
+def worker_count():
+    return getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+
+
+def queue_size():
+    return getattr(settings, 'PASSWORD_HASHING_QUEUE_SIZE', None) or worker_count() * 4
+
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    # django.setup() makes the workers usable under spawn/forkserver start methods too
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=worker_count(), initializer=_init_worker)
+    return _executor
+
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        _slots = threading.BoundedSemaphore(queue_size())
+    return _slots
+
+
+def shutdown_executor():
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+    _slots = None
+
+
+def _take_slot(timeout):
+    """
+    Take one of the queue_size() slots, waiting up to `timeout` seconds (None
+    waits for good). Returns the function that gives it back and records the call.
+    """
+    slots = _get_slots()
+    if not slots.acquire(timeout=timeout):
+        with _stats_lock:
+            _stats['rejected'] += 1
+        raise HashingBusy()
+
+    started = time.perf_counter()
+    with _stats_lock:
+        _stats['in_flight'] += 1
+
+    def release():
+        elapsed = time.perf_counter() - started
+        slots.release()
+        with _stats_lock:
+            _stats['in_flight'] -= 1
+            _stats['completed'] += 1
+            _stats['total_seconds'] += elapsed
+            _stats['max_seconds'] = max(_stats['max_seconds'], elapsed)
+
+    return release
+
+
+def run(func, *args):
+    """
+    Run one hashing call in the pool, or inline when there is a single core.
+
+    At most queue_size() calls are in flight per process; a caller that cannot
+    get a slot within PASSWORD_HASHING_QUEUE_TIMEOUT seconds gets HashingBusy.
+    """
+    if _in_worker:
+        return func(*args)
+    release = _take_slot(getattr(settings, 'PASSWORD_HASHING_QUEUE_TIMEOUT', 5))
+    try:
+        if worker_count() > 1:
+            return get_executor().submit(func, *args).result()
+        return func(*args)
+    finally:
+        release()
+
+
+def stats():
+    with _stats_lock:
+        completed = _stats['completed']
+        return {
+            'workers': worker_count(),
+            'queue_size': queue_size(),
+            'in_flight': _stats['in_flight'],
+            'completed': completed,
+            'rejected': _stats['rejected'],
+            'avg_ms': round(_stats['total_seconds'] / completed * 1000, 2) if completed else 0.0,
+            'max_ms': round(_stats['max_seconds'] * 1000, 2),
+        }
+
+
+def hash_passwords(passwords):
+    """
+    Hash many passwords in the pool, one job per password. Each job holds a
+    queue slot and at most worker_count() are submitted at a time, so a login
+    waits behind one job per worker rather than the whole batch; bulk work
+    waits for its slots instead of failing with HashingBusy.
+    """
+    passwords = list(passwords)
+    workers = worker_count()
+    if workers < 2 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    hashed, pending = [], deque()
+
+    def finish():
+        future, release = pending.popleft()
+        try:
+            hashed.append(future.result())
+        finally:
+            release()
+
+    with timed('hash'):
+        try:
+            for password in passwords:
+                if len(pending) == workers:
+                    finish()
+                release = _take_slot(None)
+                try:
+                    pending.append((get_executor().submit(make_password, password), release))
+                except BaseException:
+                    release()
+                    raise
+            while pending:
+                finish()
+        finally:
+            for _, release in pending:
+                release()
+    return hashed
+
+
+async def ahash_password(password):
+    """Hash one password without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(None, make_password, password)
@@ -0,0 +1,54 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.timings = Counter()
+        self.queries = Counter()
+        self.sql_count = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection. It reads the
+    metrics from the context, so queries run in sync_to_async threads are
+    still attributed to the request that made them.
+    """
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.timings['db'] += time.perf_counter() - started
+        metrics.sql_count += 1
+        metrics.queries[sql] += 1
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _metrics.set(metrics)
+
+
+def finish_request(token):
+    _metrics.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name` timing, if it is being sampled."""
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
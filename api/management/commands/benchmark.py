@@ -0,0 +1,148 @@
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+
+from api.audit import audit_log
+from api.benchmark import Replayer, find_regressions, load_mix, seed_users
+from api.writebehind import last_login_buffer
+
+DEFAULT_MIX = Path(settings.BASE_DIR) / 'benchmarks' / 'mix.jsonl'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Replay a request mix against an in-process server on a throwaway database and report latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default=str(DEFAULT_MIX), help='JSONL file of requests to replay')
+        parser.add_argument('--users', type=int, default=1000, help='Users seeded before the run')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--output', help='Write the summary as JSON to this file')
+        parser.add_argument('--baseline', help='Fail if results regress against this stored summary')
+        parser.add_argument('--save-baseline', help='Store the summary as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative slowdown against the baseline')
+        parser.add_argument('--sqlite-profile', choices=['tuned', 'plain'], default='tuned',
+                            help='Run with the configured SQLite options, or with SQLite defaults for comparison')
+        parser.add_argument('--server', choices=['runserver', 'gunicorn'], default='runserver',
+                            help="Serve from runserver's threaded WSGI server in-process, or from gunicorn "
+                                 'with gunicorn.conf.py and the production settings')
+        parser.add_argument('--workers', type=int, help='gunicorn worker processes (defaults to gunicorn.conf.py)')
+
+    def handle(self, *args, **options):
+        mix = load_mix(options['mix'])
+        if not mix:
+            raise CommandError(f"{options['mix']} has no requests")
+        if options['server'] == 'gunicorn' and options['sqlite_profile'] == 'plain':
+            raise CommandError('--sqlite-profile plain only applies to --server runserver')
+
+        # DEBUG keeps every query in memory, which would skew long runs
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, '127.0.0.1']
+        with tempfile.TemporaryDirectory() as directory:
+            # A file database lets the server threads share data, unlike SQLite's default in-memory test database
+            connection.settings_dict['TEST']['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+            if options['sqlite_profile'] == 'plain':
+                connection.settings_dict['OPTIONS'] = {}
+                connection.settings_dict['CONN_MAX_AGE'] = 0
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                summary = self.run(mix, options)
+            finally:
+                # Write what the in-process server buffered while the throwaway database still exists
+                last_login_buffer.flush()
+                audit_log.close()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(summary)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(summary, indent=2))
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(summary, indent=2))
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = find_regressions(summary, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regressed:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run(self, mix, options):
+        seed_users(options['users'])
+        serve = self.serve_gunicorn if options['server'] == 'gunicorn' else self.serve_runserver
+        with serve(options) as base_url:
+            return Replayer(base_url, mix).run(options['requests'], options['concurrency'])
+
+    @contextlib.contextmanager
+    def serve_runserver(self, options):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False)
+        server.set_app(get_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f'http://127.0.0.1:{server.server_port}'
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @contextlib.contextmanager
+    def serve_gunicorn(self, options):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'project.settings_production',
+            'DJANGO_DB_PATH': str(connection.settings_dict['NAME']),
+            # The replayed tokens are signed with this process's key
+            'DJANGO_SECRET_KEY': settings.SECRET_KEY,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+        }
+        if options['workers']:
+            env['GUNICORN_WORKERS'] = str(options['workers'])
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'project.wsgi'], cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_port(process, port)
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+
+    def wait_for_port(self, process, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {process.returncode}')
+            with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+            time.sleep(0.1)
+        raise CommandError(f'gunicorn did not start listening on port {port}')
+
+    def report(self, summary):
+        self.stdout.write(f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, row in summary.items():
+            self.stdout.write(
+                f"{name:<16}{row['requests']:>10}{row['errors']:>8}{row['throughput']:>10}"
+                f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+            )
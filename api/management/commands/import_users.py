@@ -0,0 +1,121 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api import changes, sharding
+from api.bulk import BULK_REGISTER_BATCH_SIZE, validate_record
+from api.conditional import bump_table_version
+from api.hashing import hash_passwords
+from api.models import CustomUser
+from api.serializers import unique_error
+from api.signals import invalidate_user_caches
+
+UPSERT_FIELDS = ['name', 'password', 'identity_number', 'date_of_birth']
+
+
+def read_records(path, file_format):
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as exc:
+                        # Handed on as an invalid record so the rest of the file still imports
+                        yield exc
+
+
+class Command(BaseCommand):
+    help = 'Import users from a CSV or NDJSON file in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='File format, guessed from the extension when omitted')
+        parser.add_argument('--batch-size', type=int, default=BULK_REGISTER_BATCH_SIZE)
+        parser.add_argument('--on-conflict', choices=['skip', 'update'], default='skip',
+                            help='Skip rows whose email or identity number exists, or update them matched by email')
+        parser.add_argument('--checkpoint',
+                            help='File recording how many records were committed, used to resume an interrupted import')
+
+    def write(self, users, on_conflict):
+        if on_conflict == 'update':
+            changes.bulk_create(users, update_conflicts=True, unique_fields=['email'], update_fields=UPSERT_FIELDS)
+        else:
+            changes.bulk_create(users, ignore_conflicts=True)
+
+    def handle(self, *args, **options):
+        if sharding.enabled():
+            raise CommandError('import_users writes to a single database; use the bulk register API with USER_SHARDS')
+        path = options['path']
+        file_format = options['format'] or ('csv' if Path(path).suffix.lower() == '.csv' else 'ndjson')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        checkpoint = Path(options['checkpoint']) if options['checkpoint'] else None
+
+        done = int(checkpoint.read_text()) if checkpoint and checkpoint.exists() else 0
+        if done:
+            self.stdout.write(f'Resuming after record {done}')
+
+        records = islice(read_records(path, file_format), done, None)
+        processed = written = invalid = 0
+        started = time.monotonic()
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            valid = []
+            for offset, record in enumerate(batch, start=done + processed + 1):
+                if isinstance(record, ValueError):
+                    data, error = None, {'non_field_errors': [f'Malformed JSON: {record}']}
+                else:
+                    data, error = validate_record(record)
+                if error:
+                    invalid += 1
+                    self.stderr.write(f'Record {offset}: {json.dumps(error)}')
+                else:
+                    valid.append((offset, CustomUser(**data)))
+            users = [user for _, user in valid]
+            for user, password in zip(users, hash_passwords(user.password for user in users)):
+                user.password = password
+            try:
+                self.write(users, options['on_conflict'])
+            except IntegrityError:
+                # An upsert matched by email can still clash on identity_number; retry row by row to find them
+                users = []
+                for offset, user in valid:
+                    try:
+                        self.write([user], options['on_conflict'])
+                    except IntegrityError:
+                        invalid += 1
+                        self.stderr.write(f'Record {offset}: ' + json.dumps(
+                            {'identity_number': [unique_error('identity_number')]}
+                        ))
+                    else:
+                        users.append(user)
+            # bulk_create sends no post_save, so drop cached copies of upserted users here
+            if options['on_conflict'] == 'update':
+                for user in users:
+                    invalidate_user_caches(CustomUser, user)
+            bump_table_version()
+            processed += len(batch)
+            written += len(users)
+            if checkpoint:
+                checkpoint.write_text(str(done + processed))
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'{done + processed} records read, {written} valid ({rate:.0f} records/s)')
+
+        if checkpoint and checkpoint.exists():
+            checkpoint.unlink()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {written} valid of {processed} records in {elapsed:.1f}s, {invalid} invalid'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.demographics import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recount the UserStat demographics buckets from scratch'
+
+    def handle(self, *args, **options):
+        users = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Counted {users} users'))
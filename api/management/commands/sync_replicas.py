@@ -0,0 +1,29 @@
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.routers import mark_replica_synced
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto every alias in DATABASE_REPLICAS'
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replicas only copies SQLite databases, use native replication elsewhere')
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            raise CommandError('DATABASE_REPLICAS is empty')
+
+        for alias in replicas:
+            target = connections[alias].settings_dict['NAME']
+            # The backup API takes a consistent snapshot even while the primary is being written
+            primary.ensure_connection()
+            with closing(sqlite3.connect(target)) as destination:
+                primary.connection.backup(destination)
+            mark_replica_synced(alias)
+            self.stdout.write(f'Synced {alias} ({target})')
@@ -0,0 +1,203 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import exception_response
+from .cache import MISSING, LRUCache
+from . import routers
+from .revocation import revocations
+from .instrumentation import finish_request, start_request, timed
+
+logger = logging.getLogger('api.performance')
+
+verified_tokens = LRUCache(
+    maxsize=getattr(settings, 'VERIFIED_TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'VERIFIED_TOKEN_CACHE_TTL', 300),
+)
+
+
+def user_id_from_token(request):
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        raise NotAuthenticated()
+
+    token = verified_tokens.get(raw_token)
+    if token is MISSING:
+        with timed('auth'):
+            token = authentication.get_validated_token(raw_token)
+        if api_settings.USER_ID_CLAIM not in token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        # Never keep a token cached past its own expiry
+        verified_tokens.set(raw_token, token, ttl=token['exp'] - time.time())
+    # Checked on every call, since a cached token can be revoked later
+    revocations.check(token)
+    return token[api_settings.USER_ID_CLAIM]
+
+
+class TokenUserIdMiddleware:
+    """
+    Answers GET get_user_id straight from the verified access token claims,
+    ahead of the session, auth and message middleware and without touching
+    the database. Disabled when GET_USER_ID_FROM_TOKEN is False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GET_USER_ID_FROM_TOKEN', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.path = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.handles(request):
+            return self.get_response(request)
+        revocations.sync_if_due()
+        return self.respond(request)
+
+    async def __acall__(self, request):
+        if not self.handles(request):
+            return await self.get_response(request)
+        await revocations.async_sync_if_due()
+        return self.respond(request)
+
+    def handles(self, request):
+        if self.path is None:
+            self.path = reverse('get_user_id')
+        return request.method == 'GET' and request.path == self.path
+
+    def respond(self, request):
+        try:
+            user_id = user_id_from_token(request)
+        except APIException as exc:
+            return exception_response(exc)
+        return JsonResponse({'user_id': user_id})
+
+
+class PerformanceMiddleware:
+    """
+    Measures a sample of requests (PERFORMANCE_SAMPLE_RATE) and reports SQL,
+    auth, serializer, renderer and password hashing time in a Server-Timing
+    header and a JSON log line on the api.performance logger. A view that runs
+    the same SQL PERFORMANCE_N_PLUS_ONE_THRESHOLD times or more is logged as a
+    likely N+1 pattern.
+    """
+
+    TIMINGS = ('db', 'auth', 'serialize', 'render', 'hash')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0.1):
+            return self.get_response(request)
+        started = time.perf_counter()
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.report(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        if random.random() >= getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0.1):
+            return await self.get_response(request)
+        started = time.perf_counter()
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.report(request, response, metrics, started)
+
+    def report(self, request, response, metrics, started):
+        total = time.perf_counter() - started
+        timings = {name: metrics.timings[name] * 1000 for name in self.TIMINGS if name in metrics.timings}
+        header = [f'{name};dur={duration:.2f}' for name, duration in timings.items()]
+        header.append(f'sql;desc="{metrics.sql_count} queries"')
+        header.append(f'total;dur={total * 1000:.2f}')
+        response['Server-Timing'] = ', '.join(header)
+
+        view = request.resolver_match.view_name if request.resolver_match else None
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'sql_count': metrics.sql_count,
+            'total_ms': round(total * 1000, 2),
+            **{f'{name}_ms': round(duration, 2) for name, duration in timings.items()},
+        }))
+
+        threshold = getattr(settings, 'PERFORMANCE_N_PLUS_ONE_THRESHOLD', 10)
+        if metrics.queries:
+            sql, count = metrics.queries.most_common(1)[0]
+            if count >= threshold:
+                logger.warning(json.dumps({'n_plus_one': view, 'count': count, 'sql': sql}))
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Tracks whether a request has written to the primary so the router keeps
+    its later reads there, and sets a short-lived cookie so the client's next
+    requests read their own writes too (REPLICA_PIN_SECONDS).
+    """
+
+    COOKIE = 'pin_primary'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = routers.start_request(pinned=self.COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.finish_request(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        state, token = routers.start_request(pinned=self.COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.finish_request(token)
+        return self.pin(response, state)
+
+    def pin(self, response, state):
+        if state['pinned'] and getattr(settings, 'DATABASE_REPLICAS', []):
+            response.set_cookie(self.COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:44
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+from api.search import install_fts, uninstall_fts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_sharding'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('email'), models.F('id'), name='user_email_lower_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('name'), models.F('id'), name='user_name_lower_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_of_birth', 'id'], name='user_date_of_birth_id_idx'),
+        ),
+        migrations.RunPython(install_fts, uninstall_fts),
+    ]
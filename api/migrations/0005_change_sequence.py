@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:48
+
+from django.db import migrations, models
+from django.db.models import F
+
+from api.search import install_fts
+
+
+def stamp_existing_users(apps, schema_editor):
+    # Give users created before change tracking a distinct position so a sync from 0 returns them
+    CustomUser = apps.get_model('api', 'CustomUser')
+    CustomUser.objects.using(schema_editor.connection.alias).update(change_seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField(unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(stamp_existing_users, migrations.RunPython.noop),
+        # Adding the column rebuilt api_customuser, which dropped the search triggers
+        migrations.RunPython(install_fts, migrations.RunPython.noop),
+    ]
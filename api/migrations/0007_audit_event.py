@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_token_revocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=20)),
+                ('user_id', models.BigIntegerField(db_index=True)),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('fields', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+from api.search import install_fts
+
+
+def count_existing_users(apps, schema_editor):
+    # Sharded deployments keep their users on the shards; run `manage.py rebuild_user_stats` there
+    alias = schema_editor.connection.alias
+    if alias != 'default':
+        return
+    CustomUser = apps.get_model('api', 'CustomUser')
+    UserStat = apps.get_model('api', 'UserStat')
+    births = CustomUser.objects.using(alias).order_by().values_list('date_of_birth').annotate(count=Count('id'))
+    stats = [UserStat(dimension='birth_date', bucket=born.isoformat(), count=count) for born, count in births]
+    total = sum(stat.count for stat in stats)
+    if total:
+        # Nobody has a signup date yet
+        stats.append(UserStat(dimension='signup_date', bucket='', count=total))
+    UserStat.objects.using(alias).bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_audit_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('bucket', models.CharField(max_length=10)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'bucket'), name='user_stat_bucket_unique')],
+            },
+        ),
+        # Added without a default first, so users who registered before now keep an empty date_joined
+        migrations.AddField(
+            model_name='customuser',
+            name='date_joined',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='date_joined',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.RunPython(count_existing_users, migrations.RunPython.noop),
+        # Adding the column rebuilt api_customuser, which dropped the search triggers
+        migrations.RunPython(install_fts, migrations.RunPython.noop),
+    ]
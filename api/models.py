@@ -1,14 +1,31 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.db import models, router
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
 
-class CustomUserManager(BaseUserManager):
+from . import changes, demographics, sharding
+
+class CustomUserQuerySet(models.QuerySet):
+    def filter(self, *args, **kwargs):
+        return sharding.route(super().filter(*args, **kwargs), kwargs)
+
+    def delete(self):
+        # Take the change sequence before the delete transaction, as CustomUser.save does
+        with changes.sequence_lock(self.db):
+            return super().delete()
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError("The Email field must be set")
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
-        user.save(using=self._db)
+        if sharding.enabled() and self._db is None:
+            sharding.save_new_user(user)
+        else:
+            user.save(using=self._db)
         return user
 
     def create_superuser(self, email, password=None, **extra_fields):
@@ -32,11 +49,107 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     date_of_birth = models.DateField()
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Position of the user's latest change in the sequence read by the sync endpoint
+    change_seq = models.BigIntegerField(default=0, db_index=True)
+    # Empty for users who registered before signups were recorded
+    date_joined = models.DateTimeField(default=timezone.now, null=True, blank=True)
 
     objects = CustomUserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name', 'identity_number', 'date_of_birth']
 
+    class Meta:
+        # Back the prefix and range filters of api.search; the trailing id
+        # lets the cursor comparison be checked from the index alone.
+        indexes = [
+            models.Index(Lower('email'), F('id'), name='user_email_lower_id_idx'),
+            models.Index(Lower('name'), F('id'), name='user_name_lower_id_idx'),
+            models.Index(fields=['date_of_birth', 'id'], name='user_date_of_birth_id_idx'),
+        ]
+
     def __str__(self):
         return self.email
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # The buckets the stored row is counted in, to move it out of them when it changes
+        user._stat_key = demographics.user_key(user)
+        return user
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not changes.tracks(update_fields):
+            return super().save(*args, **kwargs)
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'change_seq'}
+        with changes.sequence_lock(kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            self.change_seq = changes.reserve(1)[0]
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        with changes.sequence_lock(using or router.db_for_write(type(self), instance=self)):
+            return super().delete(using=using, keep_parents=keep_parents)
+
+
+class UserTombstone(models.Model):
+    """Marks a deleted CustomUser for sync clients, stored on the database the user lived on."""
+    user_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField(unique=True)
+
+
+class TokenRevocation(models.Model):
+    """
+    A revoked token (jti set) or, with jti empty, every token of user_id
+    issued up to revoked_at. Read incrementally by id into the in-process
+    index of api.revocation and deleted once expires_at has passed.
+    """
+    jti = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    user_id = models.BigIntegerField()
+    revoked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only record of a registration, update or delete, written in
+    batches by the api.audit pipeline. `fields` lists the columns an update
+    changed; values are left out so the trail holds no personal data.
+    """
+    action = models.CharField(max_length=20)
+    user_id = models.BigIntegerField(db_index=True)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    fields = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+
+
+class UserStat(models.Model):
+    """
+    Number of users per birth date or per signup date, as ISO date buckets
+    ('' for signups from before date_joined existed). Maintained on every
+    write by api.demographics so statistics are read from buckets, not users.
+    """
+    dimension = models.CharField(max_length=20)
+    bucket = models.CharField(max_length=10)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['dimension', 'bucket'], name='user_stat_bucket_unique')]
+
+
+class UserDirectory(models.Model):
+    """Global email and identity number index of sharded users, kept on the default database."""
+    user_id = models.BigIntegerField(unique=True)
+    email = models.EmailField(unique=True)
+    identity_number = models.CharField(max_length=50, unique=True)
+
+
+class ShardSequence(models.Model):
+    """
+    Named counter on the default database: the next free sharded user id,
+    reserved in blocks by sharding.allocate_user_ids, or the next change
+    sequence number, reserved by changes.reserve.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField()
@@ -0,0 +1,33 @@
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+from . import sharding
+
+
+class UserCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = getattr(settings, 'USER_LIST_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'USER_LIST_MAX_PAGE_SIZE', 500)
+
+    def paginate_shards(self, request, fields, filter_queryset=None):
+        """
+        Forward-only page of `fields` rows merged across USER_SHARDS, using
+        the same cursor format as paginate_queryset.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is not None and self.cursor.reverse:
+            raise NotFound('Paging backwards is not supported across shards.')
+        after_id = int(self.cursor.position) if self.cursor is not None and self.cursor.position else 0
+
+        rows = sharding.scatter_rows(fields, after_id, self.page_size + 1, filter_queryset)
+        page = rows[:self.page_size]
+        if len(rows) > self.page_size:
+            self.sharded_next = self.encode_cursor(Cursor(offset=0, reverse=False, position=str(page[-1]['id'])))
+        else:
+            self.sharded_next = None
+        return page
@@ -0,0 +1,56 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _contains_float(data):
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            return True
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it can produce the same bytes
+    as the stdlib encoder, falling back to JSONRenderer otherwise. Payloads
+    with floats always fall back: orjson formats them differently (1e+16 vs
+    1e16) and writes null for NaN and Infinity whatever STRICT_JSON says.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if (orjson is None or data is None or not api_settings.COMPACT_JSON or not api_settings.UNICODE_JSON
+                or self.get_indent(accepted_media_type, renderer_context or {}) or _contains_float(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+        encode = self.encoder_class().default
+
+        def default(obj):
+            # DRF's encoder turns Decimals and the like into floats, which must fall back too
+            value = encode(obj)
+            if _contains_float(value):
+                raise TypeError(f'{type(obj).__name__} encodes to a float')
+            return value
+
+        try:
+            # Datetimes go through DRF's encoder, which formats them differently from orjson
+            ret = orjson.dumps(data, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Match JSONRenderer, which escapes these because they break JavaScript string literals
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .bloom import BloomFilter
+
+
+class RevocationIndex:
+    """
+    In-process copy of TokenRevocation: a Bloom filter that answers the common
+    "not revoked" case from memory, backed by exact maps that confirm its
+    positives. New rows are pulled by id every TOKEN_REVOCATION_SYNC_INTERVAL
+    seconds, so a revocation made by another process applies within that
+    delay; expired entries are dropped every TOKEN_REVOCATION_COMPACT_INTERVAL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._jtis = {}
+        self._users = {}
+        self._bloom = self._new_bloom(0)
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._compacted_at = time.monotonic()
+
+    def _new_bloom(self, entries):
+        capacity = max(getattr(settings, 'TOKEN_REVOCATION_BLOOM_CAPACITY', 100000), entries * 2)
+        return BloomFilter(capacity, getattr(settings, 'TOKEN_REVOCATION_BLOOM_ERROR_RATE', 0.001))
+
+    def _add(self, jti, user_id, revoked_at, expires_at):
+        with self._lock:
+            if jti:
+                self._jtis[jti] = expires_at
+                self._bloom.add(f'jti:{jti}')
+                return
+            previous = self._users.get(str(user_id))
+            if previous is None or previous[0] < revoked_at:
+                self._users[str(user_id)] = (revoked_at, expires_at)
+            self._bloom.add(f'user:{user_id}')
+
+    def is_revoked(self, token):
+        """Whether `token` was revoked, from memory only; sync first with sync_if_due."""
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and f'jti:{jti}' in self._bloom and jti in self._jtis:
+            return True
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and f'user:{user_id}' in self._bloom:
+            cutoff = self._users.get(str(user_id))
+            # iat has second precision, so tokens issued in the revoking second are revoked too
+            if cutoff is not None and token.get('iat', 0) <= cutoff[0]:
+                return True
+        return False
+
+    def check(self, token):
+        if self.is_revoked(token):
+            raise InvalidToken(_('Token has been revoked'))
+
+    def due(self):
+        return time.monotonic() - self._synced_at >= getattr(settings, 'TOKEN_REVOCATION_SYNC_INTERVAL', 1.0)
+
+    def sync_if_due(self):
+        # Requests arriving while another thread syncs carry on with the current state
+        if self.due() and self._sync_lock.acquire(blocking=False):
+            try:
+                self.sync()
+            finally:
+                self._sync_lock.release()
+
+    async def async_sync_if_due(self):
+        if self.due():
+            await sync_to_async(self.sync_if_due)()
+
+    def sync(self):
+        from .models import TokenRevocation
+        # Read the primary: a replica would hide logouts until it is next synced
+        rows = TokenRevocation.objects.using('default').filter(id__gt=self._last_id).order_by('id').values_list(
+            'id', 'jti', 'user_id', 'revoked_at', 'expires_at'
+        )
+        for row_id, jti, user_id, revoked_at, expires_at in rows:
+            self._add(jti, user_id, revoked_at.timestamp(), expires_at.timestamp())
+            self._last_id = row_id
+        self._synced_at = time.monotonic()
+        if time.monotonic() - self._compacted_at >= getattr(settings, 'TOKEN_REVOCATION_COMPACT_INTERVAL', 3600):
+            self.compact()
+
+    def compact(self):
+        """Forget revocations of tokens that have expired anyway, in memory and in the database."""
+        from .models import TokenRevocation
+        now = time.time()
+        with self._lock:
+            jtis = {jti: expires_at for jti, expires_at in self._jtis.items() if expires_at > now}
+            users = {user_id: entry for user_id, entry in self._users.items() if entry[1] > now}
+            bloom = self._new_bloom(len(jtis) + len(users))
+            for jti in jtis:
+                bloom.add(f'jti:{jti}')
+            for user_id in users:
+                bloom.add(f'user:{user_id}')
+            self._jtis, self._users, self._bloom = jtis, users, bloom
+            self._compacted_at = time.monotonic()
+        TokenRevocation.objects.using('default').filter(expires_at__lte=datetime.fromtimestamp(now, timezone.utc)).delete()
+
+    def stats(self):
+        return {
+            'tokens': len(self._jtis),
+            'users': len(self._users),
+            'bloom_size': self._bloom.size,
+            'bloom_hashes': self._bloom.hashes,
+        }
+
+    def revoke_token(self, token):
+        """Revoke one token by jti until it expires."""
+        from .models import TokenRevocation
+        now = datetime.now(timezone.utc)
+        expires_at = datetime.fromtimestamp(token['exp'], timezone.utc)
+        TokenRevocation.objects.bulk_create([TokenRevocation(
+            jti=token[api_settings.JTI_CLAIM], user_id=token[api_settings.USER_ID_CLAIM],
+            revoked_at=now, expires_at=expires_at,
+        )], ignore_conflicts=True)
+        self._add(token[api_settings.JTI_CLAIM], token[api_settings.USER_ID_CLAIM], now.timestamp(), expires_at.timestamp())
+
+    def revoke_user(self, user_id):
+        """Revoke every access and refresh token issued to `user_id` so far."""
+        from .models import TokenRevocation
+        now = datetime.now(timezone.utc)
+        leeway = api_settings.LEEWAY
+        if not isinstance(leeway, timedelta):
+            leeway = timedelta(seconds=leeway)
+        expires_at = now + max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME) + leeway
+        TokenRevocation.objects.create(user_id=user_id, revoked_at=now, expires_at=expires_at)
+        self._add(None, user_id, now.timestamp(), expires_at.timestamp())
+
+
+revocations = RevocationIndex()
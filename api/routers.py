@@ -0,0 +1,99 @@
+import itertools
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.connection import ConnectionDoesNotExist
+from django.utils.module_loading import import_string
+
+# Holds a per-request dict so a write made in a sync_to_async thread still pins the request
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def start_request(pinned=False):
+    state = {'pinned': pinned}
+    return state, _request_state.set(state)
+
+
+def finish_request(token):
+    _request_state.reset(token)
+
+
+def pin_to_primary():
+    state = _request_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+def reads_from_replica():
+    """Whether reads in the current request go to a replica rather than the primary."""
+    state = _request_state.get()
+    return bool(getattr(settings, 'DATABASE_REPLICAS', [])) and not (state is not None and state['pinned'])
+
+
+def _replica_path(alias):
+    try:
+        return connections[alias].settings_dict['NAME']
+    except ConnectionDoesNotExist:
+        return None
+
+
+def replica_lag(alias):
+    """
+    Seconds since `alias` was last synced from the primary. sync_replicas
+    stamps the replica file's modification time, so every process on the
+    host reads the same value without a query; unknown replicas lag forever.
+    """
+    try:
+        return time.time() - os.path.getmtime(_replica_path(alias))
+    except (OSError, TypeError):
+        return float('inf')
+
+
+def mark_replica_synced(alias):
+    # Writes into a WAL-mode replica may only reach its -wal file, so stamp the main file explicitly
+    os.utime(_replica_path(alias))
+
+
+class RoundRobinSelector:
+    def __init__(self):
+        self.counter = itertools.count()
+
+    def select(self, replicas):
+        return replicas[next(self.counter) % len(replicas)]
+
+
+class LeastLagSelector:
+    def select(self, replicas):
+        return min(replicas, key=replica_lag)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to `default` and reads to the aliases in DATABASE_REPLICAS,
+    chosen by DATABASE_REPLICA_SELECTOR. Once a request writes, the rest of
+    it reads from the primary too.
+    """
+
+    def __init__(self):
+        self.selector = import_string(getattr(settings, 'DATABASE_REPLICA_SELECTOR', 'api.routers.RoundRobinSelector'))()
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        state = _request_state.get()
+        if not replicas or (state is not None and state['pinned']):
+            return 'default'
+        return self.selector.select(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and never migrated directly
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
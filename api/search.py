@@ -0,0 +1,126 @@
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+FTS_TABLE = 'api_customuser_fts'
+
+# External-content FTS5 index over CustomUser.name, kept in sync by triggers so
+# bulk_create, raw updates and deletes stay searchable without signals.
+FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, content='api_customuser', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_customuser BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_customuser BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name ON api_customuser BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def install_fts(apps, schema_editor):
+    """
+    Create the name index and its triggers. SQLite drops triggers when Django
+    rebuilds api_customuser, so migrations that alter the table run this again.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_SQL:
+        schema_editor.execute(sql, params=None)
+
+
+def uninstall_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_FTS_SQL:
+        schema_editor.execute(sql, params=None)
+
+
+class UserFilterSerializer(serializers.Serializer):
+    email = serializers.CharField(required=False, allow_blank=True, max_length=254)
+    name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    identity_number = serializers.CharField(required=False, allow_blank=True, max_length=50)
+    born_from = serializers.DateField(required=False, allow_null=True)
+    born_to = serializers.DateField(required=False, allow_null=True)
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200)
+
+    def validate(self, attrs):
+        if 'born_from' in attrs and 'born_to' in attrs and attrs['born_from'] > attrs['born_to']:
+            raise serializers.ValidationError({'born_to': 'Must not be earlier than born_from.'})
+        return attrs
+
+
+def _lower(value):
+    # SQLite's LOWER() only folds ASCII, so the bounds must be folded the same way.
+    if connection.vendor == 'sqlite':
+        return value.translate(_ASCII_LOWER)
+    return value.lower()
+
+
+def prefix_q(field, prefix):
+    """
+    Case-insensitive prefix match written as a range over LOWER(field) so it
+    can walk the functional index instead of scanning with LIKE.
+    """
+    prefix = _lower(prefix)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}_lower__gte': prefix, f'{field}_lower__lt': upper})
+
+
+def match_expression(text):
+    """Quote every term of a user query for FTS5 and match each one as a prefix."""
+    terms = text.split()
+    return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+
+def name_search_q(text):
+    expression = match_expression(text)
+    if connection.vendor != 'sqlite':
+        return Q(*(Q(name__icontains=term) for term in text.split()))
+    return Q(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]))
+
+
+def user_filters(params):
+    """
+    Validate the search parameters of the user list and return them as a Q
+    object, or None when the request is unfiltered. Raises ValidationError.
+    """
+    serializer = UserFilterSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    data = {key: value for key, value in serializer.validated_data.items() if value not in ('', None)}
+    if not data:
+        return None
+    q = Q()
+    if 'email' in data:
+        q &= prefix_q('email', data['email'])
+    if 'name' in data:
+        q &= prefix_q('name', data['name'])
+    if 'identity_number' in data:
+        q &= Q(identity_number=data['identity_number'])
+    if 'born_from' in data:
+        q &= Q(date_of_birth__gte=data['born_from'])
+    if 'born_to' in data:
+        q &= Q(date_of_birth__lte=data['born_to'])
+    if data.get('q', '').strip():
+        q &= name_search_q(data['q'])
+    return q
+
+
+def filter_users(queryset, q):
+    """Apply a user_filters() result, aliasing the lowered columns the prefix ranges compare against."""
+    if q is None:
+        return queryset
+    return queryset.alias(email_lower=Lower('email'), name_lower=Lower('name')).filter(q)
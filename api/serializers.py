@@ -1,17 +1,155 @@
-from rest_framework import serializers
+import datetime
+import functools
+
+from django.db import IntegrityError
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenObtainSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt import settings as jwt_settings
+
+from .availability import availability
 from .models import CustomUser
+from .revocation import revocations
+from .writebehind import record_login
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['name', 'identity_number', 'email', 'date_of_birth']
 
+# Columns a client can select with ?fields=; password hashes, permission flags
+# and bookkeeping columns are never among them
+SELECTABLE_FIELDS = tuple(UserSerializer.Meta.fields)
+
+def selected_fields(params):
+    """The fields named in the comma-separated `fields` parameter, in serializer order; all of them when absent."""
+    names = {name.strip() for name in params.get('fields', '').split(',') if name.strip()}
+    if not names:
+        return SELECTABLE_FIELDS
+    unknown = sorted(names.difference(SELECTABLE_FIELDS))
+    if unknown:
+        raise serializers.ValidationError({'fields': [
+            f'Unknown field(s): {", ".join(unknown)}. Choose from {", ".join(SELECTABLE_FIELDS)}.'
+        ]})
+    return tuple(name for name in SELECTABLE_FIELDS if name in names)
+
+class UserRowSerializer:
+    """
+    Produces the same output as UserSerializer(many=True) from `values()` rows,
+    with the per-field conversion worked out once instead of per object.
+    Pass `fields` to produce only those fields, and read only them.
+    """
+
+    fields = UserSerializer.Meta.fields
+
+    def __init__(self, fields=None):
+        if fields is not None:
+            self.fields = list(fields)
+        self.converters = []
+        for name, field in UserSerializer().fields.items():
+            if name not in self.fields:
+                continue
+            if isinstance(field, serializers.CharField):
+                convert = str
+            elif isinstance(field, serializers.DateField) and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+                convert = datetime.date.isoformat
+            else:
+                convert = field.to_representation
+            self.converters.append((name, convert))
+
+    def to_representation(self, rows):
+        converters = self.converters
+        return [
+            {name: None if row[name] is None else convert(row[name]) for name, convert in converters}
+            for row in rows
+        ]
+
+@functools.lru_cache(maxsize=None)
+def _row_serializer(fields):
+    return UserRowSerializer(fields)
+
+def row_serializer_for(params):
+    """The UserRowSerializer for the fields selected by `params`, built once per selection."""
+    return _row_serializer(selected_fields(params))
+
+UNIQUE_FIELDS = ('email', 'identity_number')
+
+def unique_error(field_name):
+    field = CustomUser._meta.get_field(field_name)
+    return field.error_messages['unique'] % {
+        'model_name': CustomUser._meta.verbose_name,
+        'field_label': field.verbose_name,
+    }
+
+def conflict_errors(data):
+    """Errors for the values of `data` already stored, once an insert has hit a unique constraint."""
+    email = CustomUser.objects.normalize_email(data['email'])
+    errors = {
+        field: [unique_error(field)]
+        for field, value in (('email', email), ('identity_number', data['identity_number']))
+        if CustomUser.objects.filter(**{field: value}).exists()
+    }
+    return errors or {'non_field_errors': ['A conflicting user was created concurrently, retry.']}
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
 
     class Meta:
         model = CustomUser
         fields = ['name', 'email', 'password', 'identity_number', 'date_of_birth']
+        # Checked against the availability index instead of one query per field
+        extra_kwargs = {field: {'validators': []} for field in UNIQUE_FIELDS}
+
+    def validate_email(self, value):
+        if availability.is_taken('email', CustomUser.objects.normalize_email(value)):
+            raise serializers.ValidationError(unique_error('email'))
+        return value
+
+    def validate_identity_number(self, value):
+        if availability.is_taken('identity_number', value):
+            raise serializers.ValidationError(unique_error('identity_number'))
+        return value
 
     def create(self, validated_data):
-        return CustomUser.objects.create_user(**validated_data)
+        try:
+            return CustomUser.objects.create_user(**validated_data)
+        except IntegrityError:
+            # Taken by a writer the index had not heard of yet
+            raise serializers.ValidationError(conflict_errors(validated_data))
+
+class AvailabilitySerializer(serializers.Serializer):
+    email = serializers.EmailField(required=False)
+    identity_number = serializers.CharField(required=False, max_length=50)
+
+    def validate_email(self, value):
+        return CustomUser.objects.normalize_email(value)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Pass an email, an identity_number or both.')
+        return attrs
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """
+    TokenObtainPairSerializer that, when UPDATE_LAST_LOGIN is on, records
+    last_login through the write-behind buffer instead of saving it inline.
+    """
+
+    def validate(self, attrs):
+        # Skips TokenObtainPairSerializer.validate, which would save last_login itself
+        data = TokenObtainSerializer.validate(self, attrs)
+        refresh = self.get_token(self.user)
+        data['refresh'] = str(refresh)
+        data['access'] = str(refresh.access_token)
+        # Looked up through the module, which rebinds api_settings when SIMPLE_JWT changes
+        if jwt_settings.api_settings.UPDATE_LAST_LOGIN:
+            record_login(self.user)
+        return data
+
+class RefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that refuses revoked refresh tokens."""
+
+    def validate(self, attrs):
+        revocations.sync_if_due()
+        revocations.check(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
@@ -0,0 +1,165 @@
+import heapq
+import threading
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from . import changes
+
+DIRECTORY_FIELDS = ('email', 'identity_number')
+ID_BLOCK_SIZE = 100
+
+_id_lock = threading.Lock()
+_id_block = {'next': 0, 'end': 0}
+
+
+def shards():
+    return getattr(settings, 'USER_SHARDS', [])
+
+
+def enabled():
+    return bool(shards())
+
+
+def shard_for_id(user_id):
+    aliases = shards()
+    return aliases[int(user_id) % len(aliases)]
+
+
+def _reserve_block(size):
+    from .models import CustomUser, ShardSequence
+    with transaction.atomic(using='default'):
+        sequence = ShardSequence.objects.using('default').select_for_update().filter(name='customuser').first()
+        if sequence is None:
+            # Start past any ids already stored on the shards, e.g. when sharding an existing table
+            highest = max(
+                (CustomUser.objects.using(alias).aggregate(Max('id'))['id__max'] or 0 for alias in shards()),
+                default=0,
+            )
+            sequence = ShardSequence(name='customuser', next_value=highest + 1)
+        start = sequence.next_value
+        sequence.next_value = start + size
+        sequence.save(using='default')
+    return start
+
+
+def allocate_user_ids(count):
+    """Hand out `count` globally unique user ids, reserving them from the default database in blocks."""
+    with _id_lock:
+        if _id_block['end'] - _id_block['next'] < count:
+            size = max(ID_BLOCK_SIZE, count)
+            _id_block['next'] = _reserve_block(size)
+            _id_block['end'] = _id_block['next'] + size
+        start = _id_block['next']
+        _id_block['next'] += count
+    return list(range(start, start + count))
+
+
+def reset_id_block():
+    with _id_lock:
+        _id_block['next'] = _id_block['end'] = 0
+
+
+def directory_lookup(field, value):
+    from .models import UserDirectory
+    return UserDirectory.objects.using('default').filter(**{field: value}).values_list('user_id', flat=True).first()
+
+
+def route(queryset, lookups):
+    """Pin a CustomUser queryset filtered by id, email or identity_number to the one shard that can match."""
+    if queryset._db is not None or not enabled():
+        return queryset
+    for key in ('id', 'pk', 'id__exact', 'pk__exact'):
+        if key in lookups:
+            return queryset.using(shard_for_id(lookups[key]))
+    for field in DIRECTORY_FIELDS:
+        for key in (field, f'{field}__exact'):
+            if key in lookups:
+                user_id = directory_lookup(field, lookups[key])
+                return queryset.none() if user_id is None else queryset.using(shard_for_id(user_id))
+    return queryset
+
+
+def save_new_user(user):
+    """Claim the user's email and identity number in the directory, then insert it on its shard."""
+    from .models import UserDirectory
+    user.id = allocate_user_ids(1)[0]
+    entry = UserDirectory.objects.using('default').create(
+        user_id=user.id, email=user.email, identity_number=user.identity_number
+    )
+    try:
+        user.save(using=shard_for_id(user.id), force_insert=True)
+    except Exception:
+        entry.delete()
+        raise
+
+
+def bulk_insert(users):
+    from .models import CustomUser, UserDirectory
+    for user, user_id in zip(users, allocate_user_ids(len(users))):
+        user.id = user_id
+    entries = [UserDirectory(user_id=user.id, email=user.email, identity_number=user.identity_number) for user in users]
+    with transaction.atomic(using='default'):
+        UserDirectory.objects.using('default').bulk_create(entries)
+    try:
+        by_shard = {}
+        for user in users:
+            by_shard.setdefault(shard_for_id(user.id), []).append(user)
+        for alias, shard_users in by_shard.items():
+            changes.bulk_create(shard_users, using=alias)
+    except Exception:
+        UserDirectory.objects.using('default').filter(user_id__in=[user.id for user in users]).delete()
+        raise
+
+
+def scatter_rows(fields, after_id, limit, filter_queryset=None):
+    """
+    Merge the first `limit` users with id > after_id across all shards, in id
+    order. `filter_queryset` narrows each shard's queryset before paging.
+    """
+    from .models import CustomUser
+    querysets = [CustomUser.objects.using(alias).filter(id__gt=after_id) for alias in shards()]
+    if filter_queryset is not None:
+        querysets = [filter_queryset(queryset) for queryset in querysets]
+    per_shard = [queryset.order_by('id').values('id', *fields)[:limit] for queryset in querysets]
+    return list(islice(heapq.merge(*per_shard, key=lambda row: row['id']), limit))
+
+
+def iter_all_rows(fields, chunk_size):
+    from .models import CustomUser
+    per_shard = [
+        CustomUser.objects.using(alias).order_by('id').values_list('id', *fields).iterator(chunk_size=chunk_size)
+        for alias in shards()
+    ]
+    for row in heapq.merge(*per_shard, key=lambda row: row[0]):
+        yield row[1:]
+
+
+class ShardRouter:
+    """
+    Routes saves, deletes and related lookups of a CustomUser instance to the
+    shard its id maps to. Queries are pinned by CustomUserQuerySet.filter.
+    """
+
+    def _shard(self, model, hints):
+        if not enabled() or model._meta.label != 'api.CustomUser':
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance.pk is not None:
+            return shard_for_id(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'api' and model_name in (
+            'userdirectory', 'shardsequence', 'tokenrevocation', 'auditevent', 'userstat',
+        ):
+            return db == 'default'
+        return None
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .availability import availability
+from . import changes, demographics, sharding
+from .conditional import bump_user_version
+from .instrumentation import record_query
+from .models import CustomUser, UserDirectory
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_user_caches(sender, instance, using=None, **kwargs):
+    pk = instance.pk
+
+    def invalidate():
+        invalidate_cached_user(pk)
+        bump_user_version(pk)
+
+    # Only once committed: a read racing the open transaction would cache the old row under the new version
+    transaction.on_commit(invalidate, using=using)
+
+
+@receiver(post_delete, sender=CustomUser)
+def record_user_tombstone(sender, instance, using, **kwargs):
+    changes.record_delete(instance, using)
+
+
+@receiver(post_save, sender=CustomUser)
+def count_saved_user(sender, instance, created, **kwargs):
+    demographics.record_save(instance, created)
+
+
+@receiver(post_delete, sender=CustomUser)
+def uncount_deleted_user(sender, instance, **kwargs):
+    demographics.record_delete(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def record_taken_values(sender, instance, **kwargs):
+    # Bulk writes send no signal and reach the index through its change sequence sync
+    availability.add(instance.email, instance.identity_number)
+
+
+@receiver(post_delete, sender=CustomUser)
+def record_freed_values(sender, instance, **kwargs):
+    availability.discard()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(pre_save, sender=CustomUser)
+def update_user_directory(sender, instance, **kwargs):
+    # Runs before the shard write so a clashing email or identity number aborts the save
+    if sharding.enabled() and instance.pk is not None:
+        UserDirectory.objects.using('default').filter(user_id=instance.pk).update(
+            email=instance.email, identity_number=instance.identity_number
+        )
+
+
+@receiver(post_delete, sender=CustomUser)
+def remove_from_user_directory(sender, instance, **kwargs):
+    if sharding.enabled():
+        UserDirectory.objects.using('default').filter(user_id=instance.pk).delete()
@@ -0,0 +1,160 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+CustomUser = get_user_model()
+
+@pytest.fixture
+def async_client():
+    return AsyncClient()
+
+@pytest.fixture
+def auth_headers(create_user):
+    token = RefreshToken.for_user(create_user).access_token
+    return {'Authorization': f'Bearer {token}'}
+
+def request(client, method, url, **kwargs):
+    return async_to_sync(getattr(client, method))(url, **kwargs)
+
+@pytest.mark.django_db
+def test_async_register(async_client):
+    data = {
+        'name': 'Test User',
+        'email': 'testuser@email.com',
+        'password': '1TestPassword!',
+        'identity_number': '12345678901',
+        'date_of_birth': '2000-01-01'
+    }
+
+    response = request(async_client, 'post', reverse('async_register'), data=data, content_type='application/json')
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert CustomUser.objects.get().check_password('1TestPassword!')
+
+@pytest.mark.django_db
+def test_error_async_register(async_client):
+    response = request(async_client, 'post', reverse('async_register'), data={}, content_type='application/json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert CustomUser.objects.count() == 0
+
+@pytest.mark.django_db
+def test_async_get_user_id(async_client, create_user, auth_headers):
+    response = request(async_client, 'get', reverse('async_get_user_id'), headers=auth_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {'user_id': create_user.id}
+
+def test_async_get_user_id_requires_credentials(async_client):
+    response = request(async_client, 'get', reverse('async_get_user_id'))
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_async_user_list_matches_sync(async_client, client_for, create_user, auth_headers):
+    sync_client = client_for(create_user)
+
+    response = request(async_client, 'get', reverse('async_users'), headers=auth_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['results'] == sync_client.get(reverse('users')).json()['results']
+
+@pytest.mark.django_db
+def test_async_user_detail(async_client, create_user, auth_headers):
+    url = reverse('async_user', kwargs={'pk': create_user.id})
+
+    response = request(async_client, 'get', url, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['email'] == 'testuser@email.com'
+
+    etag = response['ETag']
+    response = request(async_client, 'get', url, headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+@pytest.mark.django_db
+def test_async_sparse_fieldsets(async_client, create_user, auth_headers):
+    url = reverse('async_user', kwargs={'pk': create_user.id})
+
+    response = request(async_client, 'get', url + '?fields=name', headers=auth_headers)
+    assert response.json() == {'name': 'Test User'}
+    response = request(async_client, 'get', reverse('async_users') + '?fields=email', headers=auth_headers)
+    assert response.json()['results'] == [{'email': 'testuser@email.com'}]
+    response = request(async_client, 'get', url + '?fields=password', headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_async_user_detail_not_found(async_client, create_user, auth_headers):
+    url = reverse('async_user', kwargs={'pk': create_user.id + 1})
+
+    response = request(async_client, 'get', url, headers=auth_headers)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_async_update_and_delete_user(async_client, create_user, auth_headers):
+    other_user = CustomUser.objects.create_user(
+        email='testuser2@email.com',
+        password='1TestPassword!',
+        name='Test User 2',
+        identity_number='12345678902',
+        date_of_birth='2000-01-01'
+    )
+    url = reverse('async_user', kwargs={'pk': other_user.id})
+    data = {
+        'name': 'Updated Name',
+        'email': 'test@email.com',
+        'identity_number': '12345678903',
+        'date_of_birth': '2000-01-01'
+    }
+
+    response = request(async_client, 'put', url, data=data, content_type='application/json', headers=auth_headers)
+    other_user.refresh_from_db()
+    assert response.status_code == status.HTTP_200_OK
+    assert other_user.name == 'Updated Name'
+
+    response = request(async_client, 'delete', url, headers=auth_headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert CustomUser.objects.count() == 1
+
+@pytest.mark.django_db
+def test_async_server_timing_counts_queries(async_client, create_user, auth_headers, settings):
+    settings.PERFORMANCE_SAMPLE_RATE = 1.0
+    url = reverse('async_user', kwargs={'pk': create_user.id})
+
+    response = request(async_client, 'get', url, headers=auth_headers)
+
+    assert 'auth;dur=' in response['Server-Timing']
+    assert 'queries"' in response['Server-Timing']
+    assert 'sql;desc="0 queries"' not in response['Server-Timing']
+
+@pytest.mark.django_db
+def test_error_async_invalid_token_matches_sync_body(async_client, client):
+    headers = {'Authorization': 'Bearer not-a-token'}
+    response = request(async_client, 'get', reverse('async_users'), headers=headers)
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json() == client.get(reverse('users'), headers=headers).json()
+
+@pytest.mark.django_db
+def test_error_async_user_list_bad_cursor(async_client, auth_headers):
+    response = request(async_client, 'get', reverse('async_users'), data={'cursor': 'garbage'}, headers=auth_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+@pytest.mark.django_db
+def test_async_user_list_filters(async_client, auth_headers):
+    CustomUser.objects.create_user(
+        email='other@email.com', password='1TestPassword!', name='Other Person',
+        identity_number='22222222222', date_of_birth='1980-01-01'
+    )
+    response = request(async_client, 'get', reverse('async_users'), data={'q': 'other'}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [user['email'] for user in response.json()['results']] == ['other@email.com']
+
+    response = request(async_client, 'get', reverse('async_users'), data={'born_to': 'never'}, headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'born_to' in response.json()
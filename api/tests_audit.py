@@ -0,0 +1,150 @@
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .audit import AuditPipeline, audit_log
+from .models import AuditEvent
+
+CustomUser = get_user_model()
+
+def events():
+    return list(AuditEvent.objects.order_by('id').values_list('action', 'user_id', 'actor_id', 'fields'))
+
+@pytest.mark.django_db
+def test_register_update_and_delete_are_audited(client_for, create_user, django_assert_num_queries):
+    client = client_for(create_user)
+    response = APIClient().post(reverse('register'), {
+        'email': 'audited@email.com', 'password': '1TestPassword!', 'name': 'Audited User',
+        'identity_number': '22345678901', 'date_of_birth': '2000-01-01',
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    new_id = CustomUser.objects.get(email='audited@email.com').id
+    response = client.put(reverse('user', kwargs={'pk': new_id}), {
+        'email': 'audited@email.com', 'name': 'Renamed User',
+        'identity_number': '22345678901', 'date_of_birth': '2000-01-01',
+    })
+    assert response.status_code == status.HTTP_200_OK
+    response = client.delete(reverse('user', kwargs={'pk': new_id}))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    assert events() == []
+    assert audit_log.pending() == 3
+    with django_assert_num_queries(3):
+        assert audit_log.flush() == 3
+    assert events() == [
+        ('register', new_id, None, []),
+        ('update', new_id, create_user.id, ['name']),
+        ('delete', new_id, create_user.id, []),
+    ]
+    assert audit_log.stats()['written'] == 3
+
+@pytest.mark.django_db
+def test_rejected_requests_are_not_audited(client_for, create_user):
+    response = client_for(create_user).put(reverse('user', kwargs={'pk': create_user.id}), {'email': 'invalid'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert audit_log.pending() == 0
+
+@pytest.mark.django_db
+def test_async_views_are_audited(create_user):
+    headers = {'Authorization': f'Bearer {AccessToken.for_user(create_user)}'}
+    url = reverse('async_user', kwargs={'pk': create_user.id})
+    response = async_to_sync(AsyncClient().put)(url, {
+        'email': 'testuser@email.com', 'name': 'Test User',
+        'identity_number': '12345678901', 'date_of_birth': '1999-01-01',
+    }, content_type='application/json', headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    audit_log.flush()
+    assert events() == [('update', create_user.id, create_user.id, ['date_of_birth'])]
+
+@pytest.mark.django_db
+def test_batch_and_bulk_writes_are_audited(client_for, create_user):
+    create_user.is_staff = True
+    create_user.save()
+    client = client_for(create_user)
+    response = client.post(reverse('register_bulk'), [
+        {'email': f'bulk{number}@email.com', 'password': '1TestPassword!', 'name': f'Bulk User {number}',
+         'identity_number': f'3234567890{number}', 'date_of_birth': '2000-01-01'}
+        for number in range(2)
+    ], format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    ids = list(CustomUser.objects.filter(email__startswith='bulk').order_by('id').values_list('id', flat=True))
+    response = client.patch(reverse('users_batch'), [
+        {'id': ids[0], 'name': 'Renamed User'}, {'id': ids[1], 'email': 'invalid'},
+    ], format='json')
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+
+    audit_log.flush()
+    assert events() == [
+        ('register', ids[0], create_user.id, []),
+        ('register', ids[1], create_user.id, []),
+        ('update', ids[0], create_user.id, ['name']),
+    ]
+
+def test_full_queue_drops_events_after_the_enqueue_timeout():
+    pipeline = AuditPipeline(max_size=2, interval=1.0, batch_size=10, enqueue_timeout=0.01)
+    pipeline.background = False
+    assert pipeline.publish('delete', 1)
+    assert pipeline.publish('delete', 2)
+    assert not pipeline.publish('delete', 3)
+
+    stats = pipeline.stats()
+    assert (stats['published'], stats['dropped'], stats['pending']) == (2, 1, 2)
+    assert stats['lag_ms'] >= 0
+
+@pytest.mark.django_db
+def test_failed_write_keeps_events_in_order(monkeypatch):
+    pipeline = AuditPipeline(max_size=10, interval=1.0, batch_size=2, enqueue_timeout=0)
+    pipeline.background = False
+    for user_id in range(1, 4):
+        pipeline.publish('delete', user_id)
+    write = pipeline._write
+
+    def fail(batch):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(pipeline, '_write', fail)
+    with pytest.raises(RuntimeError):
+        pipeline.flush()
+    assert pipeline.pending() == 3
+
+    monkeypatch.setattr(pipeline, '_write', write)
+    assert pipeline.flush() == 3
+    assert [user_id for _, user_id, _, _ in events()] == [1, 2, 3]
+
+@pytest.mark.django_db(transaction=True)
+def test_background_thread_writes_batches_and_drains_on_close():
+    pipeline = AuditPipeline(max_size=100, interval=0.05, batch_size=10, enqueue_timeout=0)
+    for user_id in range(1, 6):
+        pipeline.publish('delete', user_id)
+
+    for _ in range(100):
+        if pipeline.written == 5:
+            break
+        time.sleep(0.05)
+    assert pipeline.written == 5
+
+    pipeline.publish('delete', 6)
+    pipeline.close()
+    assert pipeline.pending() == 0
+    assert AuditEvent.objects.count() == 6
+    assert pipeline.stats()['max_lag_ms'] > 0
+
+@pytest.mark.django_db
+def test_audit_stats_require_staff(client_for, create_user, django_capture_on_commit_callbacks):
+    response = client_for(create_user).get(reverse('audit_stats'))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    with django_capture_on_commit_callbacks(execute=True):
+        create_user.is_staff = True
+        create_user.save()
+    response = client_for(create_user).get(reverse('audit_stats'))
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()) == {'published', 'written', 'dropped', 'failures', 'pending', 'lag_ms', 'max_lag_ms'}
@@ -0,0 +1,89 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+
+from .authentication import user_cache
+from .cache import MISSING
+
+CustomUser = get_user_model()
+
+@pytest.mark.django_db
+def test_cached_user_skips_query(client_for, create_user, django_assert_num_queries):
+    create_user.is_staff = True
+    create_user.save()
+    client = client_for(create_user)
+    url = reverse('auth_cache_stats')
+
+    with django_assert_num_queries(1):
+        client.get(url)
+    with django_assert_num_queries(0):
+        response = client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['hits'] == 1
+    assert response.json()['misses'] == 1
+
+@pytest.mark.django_db
+def test_cached_user_invalidated_on_deactivate(client_for, create_user, django_capture_on_commit_callbacks):
+    client = client_for(create_user)
+    url = reverse('user', kwargs={'pk': create_user.id})
+    assert client.get(url).status_code == status.HTTP_200_OK
+
+    # The cached user is dropped once the write commits
+    with django_capture_on_commit_callbacks(execute=True):
+        create_user.is_active = False
+        create_user.save()
+        assert user_cache.get(create_user.id) is not MISSING
+
+    assert client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_cached_user_invalidated_on_delete(client_for, create_user, django_capture_on_commit_callbacks):
+    client = client_for(create_user)
+    url = reverse('user', kwargs={'pk': create_user.id})
+    assert client.get(url).status_code == status.HTTP_200_OK
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CustomUser.objects.filter(id=create_user.id).delete()
+
+    assert client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_auth_cache_stats_requires_staff(client_for, create_user, django_capture_on_commit_callbacks):
+    client = client_for(create_user)
+    assert client.get(reverse('auth_cache_stats')).status_code == status.HTTP_403_FORBIDDEN
+
+    with django_capture_on_commit_callbacks(execute=True):
+        create_user.is_staff = True
+        create_user.save()
+    response = client.get(reverse('auth_cache_stats'))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()) == {'hits', 'misses', 'size', 'maxsize'}
+
+@pytest.mark.django_db
+def test_get_user_id_from_token_skips_database(client_for, create_user, django_assert_num_queries):
+    client = client_for(create_user)
+
+    with django_assert_num_queries(0):
+        response = client.get(reverse('get_user_id'))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {'user_id': create_user.id}
+
+@pytest.mark.django_db
+def test_get_user_id_from_token_rejects_invalid_token(api_client):
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+    response = api_client.get(reverse('get_user_id'))
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response['WWW-Authenticate'] == 'Bearer realm="api"'
+    # Same body as DRF renders for its own views
+    assert response.json() == api_client.get(reverse('users')).json()
+    assert response.json()['code'] == 'token_not_valid'
+
+def test_get_user_id_from_token_requires_credentials(api_client):
+    response = api_client.get(reverse('get_user_id'))
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
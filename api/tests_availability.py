@@ -0,0 +1,107 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .availability import availability
+from .serializers import RegisterSerializer
+
+CustomUser = get_user_model()
+
+def registration(**overrides):
+    return {
+        'name': 'New User',
+        'email': 'new@email.com',
+        'password': '1TestPassword!',
+        'identity_number': '99999999999',
+        'date_of_birth': '2000-01-01',
+        **overrides,
+    }
+
+def wait_for_load():
+    loader = availability._loader
+    if loader is not None:
+        loader.join()
+
+@pytest.mark.django_db
+def test_availability_endpoint(create_user):
+    url = reverse('register_availability')
+    response = APIClient().get(url, {'email': 'testuser@EMAIL.com', 'identity_number': '55555555555'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {'email': False, 'identity_number': True}
+
+    assert APIClient().get(url, {'identity_number': '12345678901'}).data == {'identity_number': False}
+
+@pytest.mark.django_db
+def test_error_availability_endpoint(create_user):
+    url = reverse('register_availability')
+    assert APIClient().get(url).status_code == status.HTTP_400_BAD_REQUEST
+    response = APIClient().get(url, {'email': 'not-an-email'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'email' in response.data
+
+@pytest.mark.django_db
+def test_free_values_are_checked_without_queries(create_user, django_assert_num_queries):
+    availability.refresh()
+    with django_assert_num_queries(0):
+        assert RegisterSerializer(data=registration()).is_valid()
+    with django_assert_num_queries(1):
+        serializer = RegisterSerializer(data=registration(email='testuser@email.com'))
+        assert not serializer.is_valid()
+    assert 'email' in serializer.errors
+
+@pytest.mark.django_db
+def test_index_follows_creates_and_deletes(create_user):
+    availability.refresh()
+    CustomUser.objects.create_user(**registration())
+    assert availability.is_taken('email', 'new@email.com')
+
+    CustomUser.objects.filter(email='new@email.com').delete()
+    assert not availability.is_taken('email', 'new@email.com')
+
+@pytest.mark.django_db
+def test_values_written_elsewhere_are_synced(create_user, settings):
+    availability.refresh()
+    # bulk_create sends no signal, like a user registered by another process
+    CustomUser.objects.bulk_create([CustomUser(change_seq=10**9, **{
+        key: value for key, value in registration(email='elsewhere@email.com').items() if key != 'password'
+    })])
+    assert not availability.might_exist('email', 'elsewhere@email.com')
+
+    settings.REGISTRATION_AVAILABILITY_SYNC_INTERVAL = 0
+    assert availability.might_exist('email', 'elsewhere@email.com')
+
+@pytest.mark.django_db
+def test_register_reports_conflicts_the_index_missed(create_user, monkeypatch):
+    monkeypatch.setattr(availability, 'might_exist', lambda field, value: False)
+    response = APIClient().post(reverse('register'), registration(identity_number='12345678901'))
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert list(response.data) == ['identity_number']
+
+@pytest.mark.django_db(transaction=True)
+def test_index_loads_and_rebuilds_off_the_request_path(create_user, monkeypatch):
+    monkeypatch.setattr(availability, 'background', True)
+
+    # Until the first load finishes, the database answers
+    assert availability.might_exist('email', 'new@email.com')
+    wait_for_load()
+    assert not availability.might_exist('email', 'new@email.com')
+    assert availability.might_exist('email', 'testuser@email.com')
+
+    # A worn-out filter keeps answering while its replacement is built
+    for number in range(3):
+        CustomUser.objects.create_user(**registration(email=f'gone{number}@email.com', identity_number=f'5555555555{number}'))
+    CustomUser.objects.filter(email__startswith='gone').delete()
+    assert availability.worn_out()
+    assert availability.might_exist('email', 'gone0@email.com')
+    wait_for_load()
+    assert not availability.worn_out()
+    assert not availability.might_exist('email', 'gone0@email.com')
+
+@pytest.mark.django_db
+def test_warm_loads_the_index(create_user, django_assert_num_queries):
+    availability.warm()
+    with django_assert_num_queries(0):
+        assert availability.might_exist('email', 'testuser@email.com')
+    assert availability.stats()['size'] > 0
@@ -0,0 +1,110 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+
+CustomUser = get_user_model()
+
+@pytest.fixture
+def users(make_user):
+    return [make_user(i, 'batch') for i in range(3)]
+
+@pytest.fixture
+def api_client(client_for, users):
+    return client_for(users[0])
+
+@pytest.mark.django_db
+def test_batch_get_users(api_client, users, django_assert_max_num_queries):
+    missing = max(user.id for user in users) + 100
+    url = reverse('users_batch') + f'?ids={users[2].id},{missing},{users[0].id}'
+    api_client.get(url)  # warm the auth cache
+
+    with django_assert_max_num_queries(1):
+        response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    results = response.data['results']
+    assert [(result['id'], result['status']) for result in results] == [(users[2].id, 200), (missing, 404), (users[0].id, 200)]
+    assert results[0]['user']['email'] == 'batch2@email.com'
+    assert results[1]['detail'] == 'Not found.'
+
+@pytest.mark.django_db
+def test_error_batch_get_invalid_ids(api_client):
+    for query in ('', '?ids=', '?ids=1,two'):
+        response = api_client.get(reverse('users_batch') + query)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'ids' in response.data
+
+@pytest.mark.django_db
+def test_batch_update_users(api_client, users):
+    response = api_client.patch(reverse('users_batch'), [
+        {'id': users[0].id, 'name': 'First Renamed'},
+        {'id': users[1].id, 'email': 'renamed@email.com', 'date_of_birth': '1999-12-31'},
+    ], format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [result['status'] for result in response.data['results']] == [200, 200]
+    assert response.data['results'][1]['user']['email'] == 'renamed@email.com'
+    users[0].refresh_from_db()
+    users[1].refresh_from_db()
+    assert users[0].name == 'First Renamed'
+    assert users[0].email == 'batch0@email.com'
+    assert (users[1].email, str(users[1].date_of_birth)) == ('renamed@email.com', '1999-12-31')
+
+@pytest.mark.django_db
+def test_batch_update_reports_per_item_errors(api_client, users):
+    missing = max(user.id for user in users) + 100
+    response = api_client.patch(reverse('users_batch'), [
+        {'id': users[0].id, 'name': 'Updated'},
+        {'id': missing, 'name': 'Nobody'},
+        {'id': users[1].id, 'email': users[2].email},
+        {'id': users[2].id, 'date_of_birth': 'soon'},
+        {'name': 'No id'},
+        {'id': users[0].id, 'name': 'Twice'},
+    ], format='json')
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    results = response.data['results']
+    assert [result['status'] for result in results] == [200, 404, 400, 400, 400, 400]
+    assert 'email' in results[2]['errors']
+    assert 'date_of_birth' in results[3]['errors']
+    assert CustomUser.objects.get(id=users[0].id).name == 'Updated'
+    assert CustomUser.objects.get(id=users[1].id).email == 'batch1@email.com'
+
+@pytest.mark.django_db
+def test_batch_update_rejects_clashes_within_the_batch(api_client, users):
+    response = api_client.patch(reverse('users_batch'), [
+        {'id': users[1].id, 'identity_number': '70000000000'},
+        {'id': users[2].id, 'identity_number': '70000000000'},
+    ], format='json')
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert [result['status'] for result in response.data['results']] == [200, 400]
+    assert 'identity_number' in response.data['results'][1]['errors']
+
+@pytest.mark.django_db
+def test_batch_update_invalidates_caches_and_records_changes(api_client, users, django_capture_on_commit_callbacks):
+    detail = reverse('user', kwargs={'pk': users[1].id})
+    etag = api_client.get(detail)['ETag']
+    cursor = api_client.get(reverse('users_sync')).data['cursor']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.patch(reverse('users_batch'), [{'id': users[1].id, 'name': 'Fresh'}], format='json')
+    assert response.status_code == status.HTTP_200_OK
+
+    response = api_client.get(detail, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['name'] == 'Fresh'
+    changes = api_client.get(reverse('users_sync'), {'cursor': cursor}).data['changes']
+    assert [change['id'] for change in changes] == [users[1].id]
+
+@pytest.mark.django_db
+def test_error_batch_update_not_a_list(api_client):
+    response = api_client.patch(reverse('users_batch'), {'id': 1}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_batch_get_sparse_fieldsets(api_client, users):
+    response = api_client.get(reverse('users_batch') + f'?ids={users[1].id}&fields=name')
+
+    assert response.data['results'] == [{'id': users[1].id, 'status': 200, 'user': {'name': 'Batch User 1'}}]
@@ -0,0 +1,34 @@
+import pytest
+
+from .benchmark import Replayer, find_regressions, percentile, seed_users
+
+def test_percentile():
+    values = sorted(float(i) for i in range(1, 101))
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+def test_find_regressions():
+    baseline = {'users': {'requests': 10, 'errors': 0, 'throughput': 100.0, 'p50_ms': 5.0, 'p95_ms': 10.0, 'p99_ms': 12.0}}
+    slower = {'users': {'requests': 10, 'errors': 0, 'throughput': 70.0, 'p50_ms': 9.0, 'p95_ms': 15.0, 'p99_ms': 20.0}}
+
+    assert find_regressions(baseline, baseline, 0.2) == []
+    assert len(find_regressions(slower, baseline, 0.2)) == 2
+    assert find_regressions(slower, baseline, 0.6) == []
+
+@pytest.mark.django_db(transaction=True)
+def test_replay_against_live_server(live_server):
+    seed_users(5)
+    mix = [
+        {'name': 'users', 'method': 'GET', 'path': '/api/users/', 'auth': True},
+        {'name': 'user_detail', 'method': 'GET', 'path': '/api/user/{user_id}/', 'auth': True},
+    ]
+
+    summary = Replayer(live_server.url, mix).run(total_requests=10, concurrency=2)
+
+    assert set(summary) == {'users', 'user_detail'}
+    assert summary['users']['requests'] == 5
+    assert summary['users']['errors'] == 0
+    assert summary['user_detail']['errors'] == 0
@@ -0,0 +1,102 @@
+import json
+import pytest
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+CustomUser = get_user_model()
+
+@pytest.fixture(autouse=True)
+def inline_hashing(settings):
+    settings.PASSWORD_HASHING_WORKERS = 1
+
+def write_ndjson(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    return str(path)
+
+def record(number, **overrides):
+    return {
+        'name': f'Import User {number}',
+        'email': f'import{number}@email.com',
+        'password': '1TestPassword!',
+        'identity_number': f'7770000000{number}',
+        'date_of_birth': '2000-01-01',
+        **overrides,
+    }
+
+@pytest.mark.django_db
+def test_import_users_csv(tmp_path):
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        'name,email,password,identity_number,date_of_birth\n'
+        'Import User 1,import1@email.com,1TestPassword!,77700000001,2000-01-01\n'
+        'Import User 2,import2email.com,1TestPassword!,77700000002,2000-01-01\n'
+    )
+    out, err = StringIO(), StringIO()
+
+    call_command('import_users', str(path), stdout=out, stderr=err)
+
+    assert CustomUser.objects.count() == 1
+    assert CustomUser.objects.get().check_password('1TestPassword!')
+    assert 'Record 2' in err.getvalue()
+    assert 'Imported 1 valid of 2 records' in out.getvalue()
+
+@pytest.mark.django_db
+def test_import_users_skips_conflicts(tmp_path):
+    CustomUser.objects.create_user(**record(1, name='Existing'))
+    path = write_ndjson(tmp_path / 'users.ndjson', [record(1), record(2)])
+
+    call_command('import_users', path, stdout=StringIO())
+
+    assert CustomUser.objects.count() == 2
+    assert CustomUser.objects.get(email='import1@email.com').name == 'Existing'
+
+@pytest.mark.django_db
+def test_import_users_updates_conflicts(tmp_path):
+    CustomUser.objects.create_user(**record(1, name='Existing'))
+    path = write_ndjson(tmp_path / 'users.ndjson', [record(1, name='Updated')])
+
+    call_command('import_users', path, '--on-conflict', 'update', stdout=StringIO())
+
+    assert CustomUser.objects.get(email='import1@email.com').name == 'Updated'
+
+@pytest.mark.django_db
+def test_import_users_resumes_from_checkpoint(tmp_path):
+    path = write_ndjson(tmp_path / 'users.ndjson', [record(1), record(2), record(3)])
+    checkpoint = tmp_path / 'import.checkpoint'
+    checkpoint.write_text('2')
+
+    call_command('import_users', path, '--checkpoint', str(checkpoint), '--batch-size', '1', stdout=StringIO())
+
+    assert list(CustomUser.objects.values_list('email', flat=True)) == ['import3@email.com']
+    assert not checkpoint.exists()
+
+@pytest.mark.django_db
+def test_import_users_reports_identity_number_clashes_on_update(tmp_path):
+    CustomUser.objects.create_user(**record(1, name='Existing'))
+    CustomUser.objects.create_user(**record(2, name='Other'))
+    # Record 2 upserts import1@ with the identity number that belongs to import2@
+    path = write_ndjson(tmp_path / 'users.ndjson', [
+        record(3), record(1, name='Updated', identity_number='77700000002'), record(4),
+    ])
+    out, err = StringIO(), StringIO()
+
+    call_command('import_users', path, '--on-conflict', 'update', stdout=out, stderr=err)
+
+    assert CustomUser.objects.get(email='import1@email.com').name == 'Existing'
+    assert CustomUser.objects.filter(email__in=['import3@email.com', 'import4@email.com']).count() == 2
+    assert 'Record 2' in err.getvalue() and 'identity number' in err.getvalue()
+    assert 'Imported 2 valid of 3 records' in out.getvalue()
+    assert '1 invalid' in out.getvalue()
+
+@pytest.mark.django_db
+def test_import_users_reports_malformed_ndjson_lines(tmp_path):
+    path = tmp_path / 'users.ndjson'
+    path.write_text(json.dumps(record(1)) + '\n{"name": "Broken",\n' + json.dumps(record(2)) + '\n')
+    out, err = StringIO(), StringIO()
+
+    call_command('import_users', str(path), stdout=out, stderr=err)
+
+    assert CustomUser.objects.count() == 2
+    assert 'Record 2' in err.getvalue() and 'Malformed JSON' in err.getvalue()
+    assert 'Imported 2 valid of 3 records' in out.getvalue()
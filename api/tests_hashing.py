@@ -0,0 +1,92 @@
+import pytest
+from django.contrib.auth.hashers import check_password
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from . import hashing
+from .hashers import TimedPBKDF2PasswordHasher
+
+
+def test_hash_passwords_inline(settings):
+    settings.PASSWORD_HASHING_WORKERS = 1
+    hashed = hashing.hash_passwords(['first', 'second'])
+
+    assert check_password('first', hashed[0])
+    assert check_password('second', hashed[1])
+
+
+def test_hash_passwords_process_pool(settings):
+    settings.PASSWORD_HASHING_WORKERS = 2
+    hashing.shutdown_executor()
+    try:
+        hashed = hashing.hash_passwords(['first', 'second', 'third'])
+    finally:
+        hashing.shutdown_executor()
+
+    assert len(set(hashed)) == 3
+    assert all(check_password(password, encoded) for password, encoded in zip(['first', 'second', 'third'], hashed))
+
+
+def test_hash_passwords_takes_a_bounded_number_of_slots(settings, monkeypatch):
+    settings.PASSWORD_HASHING_WORKERS = 2
+    settings.PASSWORD_HASHING_QUEUE_SIZE = 8
+    hashing.shutdown_executor()
+    take_slot, peak = hashing._take_slot, []
+
+    def counting_take_slot(timeout):
+        release = take_slot(timeout)
+        peak.append(hashing.stats()['in_flight'])
+        return release
+
+    monkeypatch.setattr(hashing, '_take_slot', counting_take_slot)
+    completed = hashing.stats()['completed']
+    try:
+        hashed = hashing.hash_passwords([f'password{number}' for number in range(6)])
+    finally:
+        hashing.shutdown_executor()
+
+    assert len(hashed) == 6
+    assert max(peak) <= 2
+    assert hashing.stats()['completed'] == completed + 6
+    assert hashing.stats()['in_flight'] == 0
+
+
+@pytest.mark.django_db
+def test_login_rejected_when_hashing_queue_full(create_user, settings):
+    settings.PASSWORD_HASHING_QUEUE_SIZE = 1
+    settings.PASSWORD_HASHING_QUEUE_TIMEOUT = 0
+    hashing.shutdown_executor()
+    slots = hashing._get_slots()
+    slots.acquire()
+    try:
+        response = APIClient().post(reverse('token_obtain_pair'),
+                                    {'email': 'testuser@email.com', 'password': '1TestPassword!'})
+    finally:
+        slots.release()
+        hashing.shutdown_executor()
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response['Retry-After'] == '1'
+    assert hashing.stats()['rejected'] >= 1
+
+
+@pytest.mark.django_db
+def test_login_rehashes_to_tuned_iterations(create_user, monkeypatch):
+    monkeypatch.setattr(TimedPBKDF2PasswordHasher, 'iterations', 1000)
+
+    response = APIClient().post(reverse('token_obtain_pair'),
+                                {'email': 'testuser@email.com', 'password': '1TestPassword!'})
+    create_user.refresh_from_db()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert create_user.password.split('$')[1] == '1000'
+    assert create_user.check_password('1TestPassword!')
+
+
+def test_hashing_stats_track_completed_calls():
+    completed = hashing.stats()['completed']
+
+    hashing.hash_passwords(['only'])
+
+    assert hashing.stats()['completed'] == completed + 1
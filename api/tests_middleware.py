@@ -0,0 +1,53 @@
+import json
+import logging
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+CustomUser = get_user_model()
+
+@pytest.mark.django_db
+def test_server_timing_header(api_client, create_user, settings, caplog):
+    settings.PERFORMANCE_SAMPLE_RATE = 1.0
+    url = reverse('token_obtain_pair')
+
+    with caplog.at_level(logging.INFO, logger='api.performance'):
+        response = api_client.post(url, {'email': 'testuser@email.com', 'password': '1TestPassword!'})
+
+    timing = response['Server-Timing']
+    assert 'db;dur=' in timing
+    assert 'hash;dur=' in timing
+    assert 'render;dur=' in timing
+    assert 'total;dur=' in timing
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['view'] == 'token_obtain_pair'
+    assert record['sql_count'] >= 1
+
+@pytest.mark.django_db
+def test_server_timing_not_sampled(client_for, create_user, settings):
+    settings.PERFORMANCE_SAMPLE_RATE = 0.0
+
+    response = client_for(create_user).get(reverse('users'))
+
+    assert 'Server-Timing' not in response
+
+@pytest.mark.django_db
+def test_n_plus_one_warning(create_user, settings, caplog):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from .middleware import PerformanceMiddleware
+    settings.PERFORMANCE_SAMPLE_RATE = 1.0
+    settings.PERFORMANCE_N_PLUS_ONE_THRESHOLD = 3
+
+    def looping_view(request):
+        for _ in range(3):
+            CustomUser.objects.get(id=create_user.id)
+        return HttpResponse()
+
+    with caplog.at_level(logging.WARNING, logger='api.performance'):
+        response = PerformanceMiddleware(looping_view)(RequestFactory().get('/'))
+
+    assert 'sql;desc="3 queries"' in response['Server-Timing']
+    warning = json.loads(caplog.records[-1].getMessage())
+    assert warning['count'] == 3
+    assert 'api_customuser' in warning['sql']
@@ -0,0 +1,37 @@
+import importlib
+import sys
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+
+def load_production_settings():
+    sys.modules.pop('project.settings_production', None)
+    try:
+        return importlib.import_module('project.settings_production')
+    finally:
+        sys.modules.pop('project.settings_production', None)
+
+def test_production_settings_require_a_secret_key(monkeypatch):
+    monkeypatch.delenv('DJANGO_SECRET_KEY', raising=False)
+    with pytest.raises(ImproperlyConfigured):
+        load_production_settings()
+
+    monkeypatch.setenv('DJANGO_SECRET_KEY', 'a-production-secret')
+    production = load_production_settings()
+    assert production.SECRET_KEY == 'a-production-secret'
+    assert production.DEBUG is False
+    assert 'locmem' not in production.CACHES['default']['BACKEND']
+
+def test_production_hashing_leaves_a_thread_free(monkeypatch):
+    monkeypatch.setenv('DJANGO_SECRET_KEY', 'a-production-secret')
+    monkeypatch.setenv('GUNICORN_THREADS', '4')
+    production = load_production_settings()
+    assert production.PASSWORD_HASHING_WORKERS == 1
+    assert production.PASSWORD_HASHING_QUEUE_SIZE == 3
+
+    monkeypatch.setenv('GUNICORN_THREADS', '1')
+    monkeypatch.setenv('PASSWORD_HASHING_WORKERS', '2')
+    production = load_production_settings()
+    assert production.PASSWORD_HASHING_WORKERS == 2
+    assert production.PASSWORD_HASHING_QUEUE_SIZE == 1
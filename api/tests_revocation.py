@@ -0,0 +1,140 @@
+import datetime
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .bloom import BloomFilter
+from .models import TokenRevocation
+from .revocation import revocations
+
+CustomUser = get_user_model()
+
+def detail(client, user):
+    return client.get(reverse('user', kwargs={'pk': user.id}))
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f'jti:{i}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'other:{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+@pytest.mark.django_db
+def test_logout_revokes_the_access_and_refresh_token(client_for, create_user):
+    refresh = RefreshToken.for_user(create_user)
+    client = client_for(create_user, refresh.access_token)
+    other = client_for(create_user)
+
+    response = client.post(reverse('logout'), {'refresh': str(refresh)})
+    assert response.status_code == status.HTTP_200_OK
+
+    assert detail(client, create_user).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get(reverse('get_user_id')).status_code == status.HTTP_401_UNAUTHORIZED
+    response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # Other sessions stay logged in
+    assert detail(other, create_user).status_code == status.HTTP_200_OK
+
+@pytest.mark.django_db
+def test_get_user_id_fast_path_checks_revocation_of_cached_tokens(client_for, create_user):
+    client = client_for(create_user)
+    assert client.get(reverse('get_user_id')).status_code == status.HTTP_200_OK
+
+    client.post(reverse('logout'))
+    assert client.get(reverse('get_user_id')).status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_logout_all_revokes_every_earlier_token(client_for, create_user):
+    # iat has second precision, so issue the old tokens and revoke a little in the past
+    refresh = RefreshToken.for_user(create_user)
+    refresh['iat'] -= 10
+    access, other = refresh.access_token, AccessToken.for_user(create_user)
+    access['iat'] = other['iat'] = refresh['iat']
+    client = client_for(create_user, access)
+
+    assert client.post(reverse('logout_all')).status_code == status.HTTP_200_OK
+    TokenRevocation.objects.update(revoked_at=timezone.now() - datetime.timedelta(seconds=5))
+    revocations.reset()
+    revocations.sync()
+
+    assert detail(client, create_user).status_code == status.HTTP_401_UNAUTHORIZED
+    assert detail(client_for(create_user, other), create_user).status_code == status.HTTP_401_UNAUTHORIZED
+    response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # Logging in again after the revocation works
+    fresh = client_for(create_user)
+    assert detail(fresh, create_user).status_code == status.HTTP_200_OK
+
+@pytest.mark.django_db
+def test_error_logout_with_another_users_refresh_token(client_for, create_user):
+    other_user = CustomUser.objects.create_user(
+        email='other@email.com', password='1TestPassword!', name='Other',
+        identity_number='12345678902', date_of_birth='2000-01-01'
+    )
+    client = client_for(create_user)
+    response = client.post(reverse('logout'), {'refresh': str(RefreshToken.for_user(other_user))})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert TokenRevocation.objects.count() == 0
+
+@pytest.mark.django_db
+def test_revocations_from_other_processes_are_synced(client_for, create_user, django_assert_num_queries):
+    token = RefreshToken.for_user(create_user).access_token
+    client = client_for(create_user, token)
+    assert detail(client, create_user).status_code == status.HTTP_200_OK
+
+    # Written by another process: only the database knows about it
+    TokenRevocation.objects.create(
+        jti=token['jti'], user_id=create_user.id,
+        revoked_at=timezone.now(), expires_at=timezone.now() + datetime.timedelta(minutes=5)
+    )
+    assert detail(client, create_user).status_code == status.HTTP_200_OK
+    with django_assert_num_queries(1):
+        revocations.sync()
+    with django_assert_num_queries(0):
+        revocations.sync_if_due()
+    assert detail(client, create_user).status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_revocations_are_synced_from_the_primary(create_user, settings):
+    # Replica reads would fail here: the alias is not configured
+    settings.DATABASE_REPLICAS = ['replica1']
+    token = RefreshToken.for_user(create_user).access_token
+    TokenRevocation.objects.using('default').create(
+        jti=token['jti'], user_id=create_user.id,
+        revoked_at=timezone.now(), expires_at=timezone.now() + datetime.timedelta(minutes=5)
+    )
+
+    revocations.sync()
+    assert revocations.is_revoked(token)
+
+@pytest.mark.django_db
+def test_compaction_drops_expired_revocations(create_user):
+    token = RefreshToken.for_user(create_user).access_token
+    revocations.revoke_token(token)
+    TokenRevocation.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+    revocations.reset()
+    revocations.sync()
+    assert revocations.stats()['tokens'] == 1
+
+    revocations.compact()
+    assert revocations.stats()['tokens'] == 0
+    assert TokenRevocation.objects.count() == 0
+
+@pytest.mark.django_db
+def test_async_endpoints_reject_revoked_tokens(client_for, create_user):
+    token = RefreshToken.for_user(create_user).access_token
+    client_for(create_user, token).post(reverse('logout'))
+
+    response = async_to_sync(AsyncClient().get)(
+        reverse('async_user', kwargs={'pk': create_user.id}), headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
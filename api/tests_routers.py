@@ -0,0 +1,137 @@
+import os
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import routers
+from .conditional import get_cached_response
+from .middleware import ReplicaPinningMiddleware
+from .models import CustomUser
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica1', 'replica2']
+    return settings.DATABASE_REPLICAS
+
+@pytest.fixture
+def file_replicas(settings, tmp_path):
+    """Two SQLite file-copy replicas, added as connections next to the primary."""
+    aliases = ['replica1', 'replica2']
+    primary = connections['default']
+    for alias in aliases:
+        connections[alias] = type(primary)({**primary.settings_dict, 'NAME': str(tmp_path / f'{alias}.sqlite3')}, alias)
+    settings.DATABASE_REPLICAS = aliases
+    yield aliases
+    for alias in aliases:
+        connections[alias].close()
+        del connections[alias]
+
+def test_reads_go_to_primary_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+
+    assert routers.PrimaryReplicaRouter().db_for_read(CustomUser) == 'default'
+
+def test_reads_round_robin_across_replicas(replicas):
+    router = routers.PrimaryReplicaRouter()
+
+    assert [router.db_for_read(CustomUser) for _ in range(4)] == ['replica1', 'replica2', 'replica1', 'replica2']
+    assert router.db_for_write(CustomUser) == 'default'
+
+def test_least_lag_selector_prefers_freshest_replica(file_replicas, settings):
+    settings.DATABASE_REPLICA_SELECTOR = 'api.routers.LeastLagSelector'
+    router = routers.PrimaryReplicaRouter()
+    assert routers.replica_lag('replica1') == float('inf')
+
+    # The sync time is the replica file's own, so any process sees it
+    for alias, age in (('replica1', 60), ('replica2', 5)):
+        open(connections[alias].settings_dict['NAME'], 'w').close()
+        os.utime(connections[alias].settings_dict['NAME'], (time.time() - age,) * 2)
+    assert router.db_for_read(CustomUser) == 'replica2'
+
+    routers.mark_replica_synced('replica1')
+    assert router.db_for_read(CustomUser) == 'replica1'
+    assert routers.replica_lag('replica1') < 5
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_from_synced_file_replica(file_replicas):
+    CustomUser.objects.create_user(
+        email='replica1@email.com', password='1TestPassword!', name='Replica User 1',
+        identity_number='88800000001', date_of_birth='2000-01-01'
+    )
+    call_command('sync_replicas', stdout=StringIO())
+    CustomUser.objects.create_user(
+        email='replica2@email.com', password='1TestPassword!', name='Replica User 2',
+        identity_number='88800000002', date_of_birth='2000-01-01'
+    )
+
+    # The second user only reaches the replicas on the next sync
+    users = CustomUser.objects.order_by('id')
+    assert users.db in file_replicas
+    assert list(users.values_list('email', flat=True)) == ['replica1@email.com']
+    call_command('sync_replicas', stdout=StringIO())
+    assert [list(CustomUser.objects.using(alias).values_list('email', flat=True)) for alias in file_replicas] == [
+        ['replica1@email.com', 'replica2@email.com'],
+    ] * 2
+
+def test_replicas_are_not_migrated(replicas):
+    router = routers.PrimaryReplicaRouter()
+
+    assert router.allow_migrate('default', 'api')
+    assert not router.allow_migrate('replica1', 'api')
+
+def test_write_pins_rest_of_request_to_primary(replicas):
+    router = routers.PrimaryReplicaRouter()
+    reads = []
+
+    def view(request):
+        reads.append(router.db_for_read(CustomUser))
+        router.db_for_write(CustomUser)
+        reads.append(router.db_for_read(CustomUser))
+        return HttpResponse()
+
+    response = ReplicaPinningMiddleware(view)(RequestFactory().get('/'))
+
+    assert reads[0] in replicas
+    assert reads[1] == 'default'
+    assert ReplicaPinningMiddleware.COOKIE in response.cookies
+
+def test_pin_cookie_reads_from_primary(replicas):
+    router = routers.PrimaryReplicaRouter()
+    reads = []
+
+    def view(request):
+        reads.append(router.db_for_read(CustomUser))
+        return HttpResponse()
+
+    request = RequestFactory().get('/')
+    request.COOKIES[ReplicaPinningMiddleware.COOKIE] = '1'
+    ReplicaPinningMiddleware(view)(request)
+
+    assert reads == ['default']
+
+@pytest.mark.django_db(transaction=True)
+def test_responses_read_from_a_replica_are_not_cached(file_replicas):
+    user = CustomUser.objects.create_user(
+        email='replica1@email.com', password='1TestPassword!', name='Replica User 1',
+        identity_number='88800000001', date_of_birth='2000-01-01'
+    )
+    call_command('sync_replicas', stdout=StringIO())
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    url = reverse('user', kwargs={'pk': user.id})
+
+    etag = client.get(url)['ETag']
+    assert get_cached_response(etag) is None
+
+    # Pinned clients read the primary, which is safe to cache
+    client.cookies[ReplicaPinningMiddleware.COOKIE] = '1'
+    assert client.get(url)['ETag'] == etag
+    assert get_cached_response(etag)['email'] == 'replica1@email.com'
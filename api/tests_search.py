@@ -0,0 +1,106 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+
+from .search import filter_users, user_filters
+
+CustomUser = get_user_model()
+
+PEOPLE = [
+    ('Alice Johnson', 'Alice.Johnson@email.com', '11111111111', '1985-03-14'),
+    ('Alan Smith', 'alan.smith@email.com', '22222222222', '1990-07-01'),
+    ('Bob Johnston', 'bob@example.com', '33333333333', '2001-11-30'),
+    ('Carol Alvarez', 'carol@example.com', '44444444444', '1990-01-01'),
+]
+
+@pytest.fixture
+def people():
+    return [
+        CustomUser.objects.create_user(
+            email=email, password='1TestPassword!', name=name,
+            identity_number=identity_number, date_of_birth=date_of_birth
+        )
+        for name, email, identity_number, date_of_birth in PEOPLE
+    ]
+
+@pytest.fixture
+def api_client(client_for, people):
+    return client_for(people[0])
+
+def search(api_client, **params):
+    response = api_client.get(reverse('users'), params)
+    assert response.status_code == status.HTTP_200_OK, response.data
+    return [user['name'] for user in response.data['results']]
+
+@pytest.mark.django_db
+def test_filter_by_email_prefix_ignores_case(api_client):
+    assert search(api_client, email='al') == ['Alice Johnson', 'Alan Smith']
+    assert search(api_client, email='ALICE.') == ['Alice Johnson']
+    assert search(api_client, email='zed') == []
+
+@pytest.mark.django_db
+def test_filter_by_name_prefix_and_identity_number(api_client):
+    assert search(api_client, name='bob') == ['Bob Johnston']
+    assert search(api_client, identity_number='44444444444') == ['Carol Alvarez']
+    assert search(api_client, identity_number='4444') == []
+
+@pytest.mark.django_db
+def test_filter_by_date_of_birth_range(api_client):
+    assert search(api_client, born_from='1990-01-01', born_to='1990-12-31') == ['Alan Smith', 'Carol Alvarez']
+    assert search(api_client, born_from='2000-01-01') == ['Bob Johnston']
+    assert search(api_client, born_to='1989-12-31') == ['Alice Johnson']
+
+@pytest.mark.django_db
+def test_filters_combine(api_client):
+    assert search(api_client, email='a', born_from='1990-01-01') == ['Alan Smith']
+
+@pytest.mark.django_db
+def test_full_text_name_search(api_client):
+    assert search(api_client, q='johns') == ['Alice Johnson', 'Bob Johnston']
+    assert search(api_client, q='alice johnson') == ['Alice Johnson']
+    assert search(api_client, q='"al OR*') == []
+
+@pytest.mark.django_db
+def test_full_text_index_follows_writes(api_client, people):
+    people[0].name = 'Alicia Keys'
+    people[0].save()
+    people[2].delete()
+    CustomUser.objects.bulk_create([CustomUser(
+        email='dave@example.com', name='Dave Johnson', identity_number='55555555555', date_of_birth='1970-01-01'
+    )])
+    assert search(api_client, q='johns') == ['Dave Johnson']
+    assert search(api_client, q='keys') == ['Alicia Keys']
+
+@pytest.mark.django_db
+def test_filtered_list_pages_with_cursor(api_client):
+    response = api_client.get(reverse('users'), {'email': 'a', 'page_size': 1})
+    assert [user['name'] for user in response.data['results']] == ['Alice Johnson']
+    response = api_client.get(response.data['next'])
+    assert [user['name'] for user in response.data['results']] == ['Alan Smith']
+    assert response.data['next'] is None
+
+@pytest.mark.django_db
+def test_error_invalid_filters(api_client):
+    response = api_client.get(reverse('users'), {'born_from': 'yesterday'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'born_from' in response.data
+
+    response = api_client.get(reverse('users'), {'born_from': '2000-01-01', 'born_to': '1990-01-01'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'born_to' in response.data
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='checks SQLite query plans')
+@pytest.mark.parametrize('params, index', [
+    ({'email': 'al'}, 'user_email_lower_id_idx'),
+    ({'name': 'al'}, 'user_name_lower_id_idx'),
+    ({'born_from': '1990-01-01', 'born_to': '1990-12-31'}, 'user_date_of_birth_id_idx'),
+    ({'q': 'johns'}, 'api_customuser_fts'),
+])
+def test_filters_use_indexes(people, params, index):
+    queryset = filter_users(CustomUser.objects.all(), user_filters(params)).order_by('id').values('id')
+    plan = queryset.explain()
+    assert index in plan
+    assert 'SCAN api_customuser ' not in plan + ' '
@@ -0,0 +1,194 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from . import demographics, sharding
+from .models import UserDirectory, UserStat
+
+CustomUser = get_user_model()
+SHARDS = ['shard0', 'shard1']
+
+pytestmark = pytest.mark.django_db(databases=['default', *SHARDS])
+
+@pytest.fixture(autouse=True)
+def sharded(settings):
+    settings.USER_SHARDS = SHARDS
+    settings.PASSWORD_HASHING_WORKERS = 1
+    sharding.reset_id_block()
+    yield
+    sharding.reset_id_block()
+
+def test_users_are_spread_across_shards(make_user):
+    users = [make_user(i, 'shard') for i in range(4)]
+
+    assert [user.id for user in users] == [1, 2, 3, 4]
+    assert CustomUser.objects.using('shard0').count() == 2
+    assert CustomUser.objects.using('shard1').count() == 2
+    assert CustomUser.objects.using('default').count() == 0
+    assert UserDirectory.objects.count() == 4
+
+def test_lookups_route_to_one_shard(make_user):
+    user = make_user(1, 'shard')
+
+    assert CustomUser.objects.filter(id=user.id).db == sharding.shard_for_id(user.id)
+    assert CustomUser.objects.get(email='shard1@email.com').id == user.id
+    assert CustomUser.objects.get(identity_number=user.identity_number).id == user.id
+    assert not CustomUser.objects.filter(email='missing@email.com').exists()
+
+def test_login_and_detail_on_shard(make_user):
+    user = make_user(1, 'shard')
+    client = APIClient()
+
+    response = client.post(reverse('token_obtain_pair'), {'email': 'shard1@email.com', 'password': '1TestPassword!'})
+    assert response.status_code == status.HTTP_200_OK
+
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+    response = client.get(reverse('user', kwargs={'pk': user.id}))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['email'] == 'shard1@email.com'
+
+def test_register_rejects_duplicates_across_shards(make_user):
+    make_user(1, 'shard')
+    data = {
+        'name': 'Duplicate',
+        'email': 'shard1@email.com',
+        'password': '1TestPassword!',
+        'identity_number': '99999999999',
+        'date_of_birth': '2000-01-01'
+    }
+
+    response = APIClient().post(reverse('register'), data)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'email' in response.data
+
+def test_async_register_on_shard(make_user):
+    make_user(1, 'shard')
+    register = async_to_sync(AsyncClient().post)
+    data = {
+        'name': 'Async User', 'email': 'async@email.com', 'password': '1TestPassword!',
+        'identity_number': '77700000001', 'date_of_birth': '2000-01-01',
+    }
+
+    response = register(reverse('async_register'), data, content_type='application/json')
+    assert response.status_code == status.HTTP_201_CREATED
+    user = CustomUser.objects.get(email='async@email.com')
+    assert CustomUser.objects.filter(id=user.id).db == sharding.shard_for_id(user.id)
+    assert CustomUser.objects.using('default').count() == 0
+    assert UserDirectory.objects.filter(user_id=user.id, email='async@email.com').exists()
+
+    response = register(reverse('async_register'), {**data, 'email': 'shard1@email.com', 'identity_number': '77700000002'},
+                        content_type='application/json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'email' in response.json()
+    assert UserDirectory.objects.count() == 2
+
+def test_list_merges_shards_in_id_order(make_user, client_for):
+    users = [make_user(i, 'shard') for i in range(5)]
+    client = client_for(users[0])
+
+    url = reverse('users') + '?page_size=2'
+    emails = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        emails.extend(row['email'] for row in response.data['results'])
+        url = response.data['next']
+
+    assert emails == [user.email for user in users]
+
+def test_search_filters_every_shard(make_user, client_for):
+    users = [make_user(i, 'shard') for i in range(4)]
+    client = client_for(users[0])
+
+    response = client.get(reverse('users'), {'q': 'shard', 'email': 'SHARD'})
+    assert [row['email'] for row in response.data['results']] == [user.email for user in users]
+
+    response = client.get(reverse('users'), {'name': 'shard user 3'})
+    assert [row['email'] for row in response.data['results']] == [users[3].email]
+
+def test_sync_merges_shards_in_change_order(make_user, client_for):
+    users = [make_user(i, 'shard') for i in range(4)]
+    client = client_for(users[2])
+    cursor = client.get(reverse('users_sync')).data['cursor']
+
+    users[3].name = 'Renamed'
+    users[3].save()
+    deleted_id = users[0].id
+    users[0].delete()
+    users[1].name = 'Renamed'
+    users[1].save()
+
+    changes = client.get(reverse('users_sync'), {'cursor': cursor}).data['changes']
+    assert [(change['id'], change['deleted']) for change in changes] == [
+        (users[3].id, False), (deleted_id, True), (users[1].id, False)
+    ]
+
+def test_batch_get_and_update_across_shards(make_user, client_for):
+    users = [make_user(i, 'shard') for i in range(4)]
+    client = client_for(users[0])
+
+    response = client.get(reverse('users_batch'), {'ids': ','.join(str(user.id) for user in reversed(users))})
+    assert [result['user']['email'] for result in response.data['results']] == [user.email for user in reversed(users)]
+
+    response = client.patch(reverse('users_batch'), [
+        {'id': users[1].id, 'email': 'moved1@email.com'},
+        {'id': users[2].id, 'email': 'moved2@email.com'},
+    ], format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert CustomUser.objects.get(email='moved2@email.com').id == users[2].id
+    assert UserDirectory.objects.get(user_id=users[1].id).email == 'moved1@email.com'
+
+def test_update_and_delete_keep_directory_in_sync(make_user, client_for):
+    user = make_user(1, 'shard')
+    client = client_for(make_user(2, 'shard'))
+    url = reverse('user', kwargs={'pk': user.id})
+
+    response = client.put(url, {
+        'name': 'Moved',
+        'email': 'moved@email.com',
+        'identity_number': user.identity_number,
+        'date_of_birth': '2000-01-01'
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert UserDirectory.objects.get(user_id=user.id).email == 'moved@email.com'
+
+    response = client.delete(url)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert not UserDirectory.objects.filter(user_id=user.id).exists()
+    assert not CustomUser.objects.filter(id=user.id).exists()
+
+def test_bulk_register_spreads_across_shards(make_user, client_for):
+    admin = make_user(0, 'shard')
+    admin.is_staff = True
+    admin.save()
+    client = client_for(admin)
+    records = [
+        {'name': f'Bulk {i}', 'email': f'bulk{i}@email.com', 'password': '1TestPassword!',
+         'identity_number': f'5550000000{i}', 'date_of_birth': '2000-01-01'}
+        for i in range(4)
+    ] + [{'name': 'Dup', 'email': 'shard0@email.com', 'password': '1TestPassword!',
+          'identity_number': '55500000009', 'date_of_birth': '2000-01-01'}]
+
+    response = client.post(reverse('register_bulk'), records, format='json')
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert response.data['created'] == 4
+    assert UserDirectory.objects.count() == 5
+    assert CustomUser.objects.using('shard0').count() + CustomUser.objects.using('shard1').count() == 5
+
+def test_stats_count_users_on_every_shard(make_user, client_for):
+    users = [make_user(i, 'shard') for i in range(4)]
+    client = client_for(users[0])
+    response = client.patch(reverse('users_batch'), [{'id': users[1].id, 'date_of_birth': '1990-01-01'}], format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert client.delete(reverse('user', kwargs={'pk': users[2].id})).status_code == status.HTTP_204_NO_CONTENT
+    incremental = {(row.dimension, row.bucket): row.count for row in UserStat.objects.exclude(count=0)}
+
+    assert demographics.rebuild() == 3
+    assert {(row.dimension, row.bucket): row.count for row in UserStat.objects.exclude(count=0)} == incremental
+    assert client.get(reverse('users_stats')).data['birth_years'] == {'1990': 1, '2000': 2}
@@ -0,0 +1,145 @@
+import datetime
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from . import demographics
+from .models import UserStat
+
+CustomUser = get_user_model()
+
+@pytest.fixture(autouse=True)
+def inline_hashing(settings):
+    settings.PASSWORD_HASHING_WORKERS = 1
+
+def record(number, date_of_birth='1990-05-05'):
+    return {
+        'name': f'Stats Record {number}', 'email': f'record{number}@email.com', 'password': '1TestPassword!',
+        'identity_number': f'4450000000{number}', 'date_of_birth': date_of_birth,
+    }
+
+def stored():
+    return {(row.dimension, row.bucket): row.count for row in UserStat.objects.exclude(count=0)}
+
+def assert_matches_rebuild():
+    incremental = stored()
+    demographics.rebuild()
+    assert incremental == stored()
+    return incremental
+
+@pytest.mark.django_db
+def test_detail_writes_move_users_between_buckets(make_user, client_for):
+    user = make_user(1, 'stats')
+    other = make_user(2, 'stats', date_of_birth='1980-02-29')
+    client = client_for(user)
+
+    response = client.put(reverse('user', kwargs={'pk': other.id}), {
+        'name': 'Stats User 2', 'email': 'stats2@email.com',
+        'identity_number': other.identity_number, 'date_of_birth': '1985-03-01',
+    })
+    assert response.status_code == status.HTTP_200_OK
+    response = client.put(reverse('user', kwargs={'pk': user.id}), {
+        'name': 'Renamed', 'email': 'stats1@email.com',
+        'identity_number': user.identity_number, 'date_of_birth': '2000-01-01',
+    })
+    assert response.status_code == status.HTTP_200_OK
+    today = timezone.localdate().isoformat()
+    assert assert_matches_rebuild() == {
+        ('birth_date', '2000-01-01'): 1, ('birth_date', '1985-03-01'): 1, ('signup_date', today): 2,
+    }
+
+    assert client.delete(reverse('user', kwargs={'pk': other.id})).status_code == status.HTTP_204_NO_CONTENT
+    assert assert_matches_rebuild() == {('birth_date', '2000-01-01'): 1, ('signup_date', today): 1}
+
+@pytest.mark.django_db
+def test_bulk_writes_are_counted(make_user, client_for, tmp_path):
+    admin = make_user(1, 'stats')
+    admin.is_staff = True
+    admin.save()
+    client = client_for(admin)
+    response = client.post(reverse('register_bulk'), [record(1), record(2, '1970-12-31')], format='json')
+    assert response.data['created'] == 2
+    ids = list(CustomUser.objects.filter(email__startswith='record').order_by('id').values_list('id', flat=True))
+    response = client.patch(reverse('users_batch'), [{'id': ids[0], 'date_of_birth': '1960-06-15'}], format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert_matches_rebuild()
+
+    path = tmp_path / 'users.ndjson'
+    path.write_text(''.join(json.dumps(item) + '\n' for item in [record(2, '1999-09-09'), record(3)]))
+    call_command('import_users', str(path), '--on-conflict', 'update', stdout=StringIO())
+    path.write_text(json.dumps(record(3, '1950-01-01')) + '\n' + json.dumps(record(4)) + '\n')
+    call_command('import_users', str(path), stdout=StringIO())
+
+    counts = assert_matches_rebuild()
+    assert counts[('birth_date', '1999-09-09')] == 1
+    assert ('birth_date', '1970-12-31') not in counts
+    assert ('birth_date', '1950-01-01') not in counts
+    assert counts[('birth_date', '1990-05-05')] == 2
+
+@pytest.mark.django_db
+def test_bulk_lookups_stay_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(demographics, 'LOOKUP_BATCH_SIZE', 2)
+    path = tmp_path / 'users.ndjson'
+    path.write_text(''.join(json.dumps(record(number)) + '\n' for number in range(3)))
+    call_command('import_users', str(path), stdout=StringIO())
+    path.write_text(''.join(json.dumps(record(number, '1999-09-09')) + '\n' for number in range(5)))
+
+    with CaptureQueriesContext(connection) as queries:
+        call_command('import_users', str(path), '--on-conflict', 'update', stdout=StringIO())
+
+    statements = [query['sql'] for query in queries]
+    assert sum('"email" IN' in sql for sql in statements) == 3
+    assert any('"change_seq" BETWEEN' in sql for sql in statements)
+    assert assert_matches_rebuild()[('birth_date', '1999-09-09')] == 5
+
+@pytest.mark.django_db
+def test_summary_groups_buckets(make_user):
+    for number, born in enumerate(['2010-06-01', '2008-10-19', '2008-10-18', '1950-01-01']):
+        make_user(number, 'stats', date_of_birth=born)
+    CustomUser.objects.filter(email='stats3@email.com').update(date_joined=None)
+    demographics.rebuild()
+
+    summary = demographics.summary({'signup_period': 'year'}, today=datetime.date(2026, 10, 18))
+
+    assert summary['total'] == 4
+    assert summary['birth_years'] == {'1950': 1, '2008': 2, '2010': 1}
+    assert summary['age_bands'] == {
+        '0-17': 2, '18-24': 1, '25-34': 0, '35-44': 0, '45-54': 0, '55-64': 0, '65+': 1,
+    }
+    assert summary['signups'] == {str(timezone.localdate().year): 3, 'unknown': 1}
+
+@pytest.mark.django_db
+def test_stats_endpoint_reads_only_buckets(make_user, client_for, django_assert_num_queries):
+    users = [make_user(number, 'stats') for number in range(5)]
+    client = client_for(users[0])
+    url = reverse('users_stats')
+    client.get(url)  # warm the auth cache
+
+    with django_assert_num_queries(1):
+        response = client.get(url + '?signup_period=day')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['total'] == 5
+    assert response.json()['signups'] == {timezone.localdate().isoformat(): 5}
+    assert client.get(url + '?signup_period=week').status_code == status.HTTP_400_BAD_REQUEST
+    assert APIClient().get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_rebuild_command_recounts_from_scratch(make_user):
+    make_user(1, 'stats')
+    UserStat.objects.all().delete()
+    out = StringIO()
+
+    call_command('rebuild_user_stats', stdout=out)
+
+    assert 'Counted 1 users' in out.getvalue()
+    assert stored() == {('birth_date', '2000-01-01'): 1, ('signup_date', timezone.localdate().isoformat()): 1}
@@ -0,0 +1,99 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .models import UserTombstone
+
+CustomUser = get_user_model()
+
+@pytest.fixture
+def users(make_user):
+    return [make_user(i, 'sync') for i in range(3)]
+
+@pytest.fixture
+def api_client(client_for, users):
+    return client_for(users[0])
+
+def sync(api_client, **params):
+    response = api_client.get(reverse('users_sync'), params)
+    assert response.status_code == status.HTTP_200_OK, response.data
+    return response.data
+
+@pytest.mark.django_db
+def test_sync_from_start_returns_every_user(api_client, users):
+    data = sync(api_client)
+    assert [change['id'] for change in data['changes']] == [user.id for user in users]
+    assert data['changes'][0]['user']['email'] == 'sync0@email.com'
+    assert data['more'] is False
+    assert data['cursor'] == users[-1].change_seq
+    assert sync(api_client, cursor=data['cursor'])['changes'] == []
+
+@pytest.mark.django_db
+def test_sync_returns_only_later_changes(make_user, api_client, users):
+    cursor = sync(api_client)['cursor']
+
+    response = api_client.put(reverse('user', kwargs={'pk': users[1].id}), {
+        'name': 'Renamed', 'email': users[1].email,
+        'identity_number': users[1].identity_number, 'date_of_birth': '2000-01-01'
+    })
+    assert response.status_code == status.HTTP_200_OK
+    deleted_id = users[2].id
+    api_client.delete(reverse('user', kwargs={'pk': deleted_id}))
+    added = make_user(9, 'sync')
+
+    data = sync(api_client, cursor=cursor)
+    assert [(change['id'], change['deleted']) for change in data['changes']] == [
+        (users[1].id, False), (deleted_id, True), (added.id, False)
+    ]
+    assert data['changes'][0]['user']['name'] == 'Renamed'
+    assert 'user' not in data['changes'][1]
+
+@pytest.mark.django_db
+def test_sync_pages_follow_the_cursor(api_client, users):
+    first = sync(api_client, page_size=2)
+    assert len(first['changes']) == 2
+    assert first['more'] is True
+    second = sync(api_client, cursor=first['cursor'], page_size=2)
+    assert [change['id'] for change in second['changes']] == [users[2].id]
+    assert second['more'] is False
+
+@pytest.mark.django_db
+def test_login_is_not_a_change(api_client, users):
+    cursor = sync(api_client)['cursor']
+    response = APIClient().post(reverse('token_obtain_pair'), {'email': users[1].email, 'password': '1TestPassword!'})
+    assert response.status_code == status.HTTP_200_OK
+    assert sync(api_client, cursor=cursor)['changes'] == []
+
+@pytest.mark.django_db
+def test_bulk_register_and_queryset_delete_are_changes(api_client, users):
+    users[0].is_staff = True
+    users[0].save()
+    cursor = sync(api_client)['cursor']
+    response = api_client.post(reverse('register_bulk'), [{
+        'name': 'Bulk User', 'email': 'bulk@email.com', 'password': '1TestPassword!',
+        'identity_number': '55500000099', 'date_of_birth': '2000-01-01'
+    }], format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    CustomUser.objects.filter(email=users[2].email).delete()
+
+    changes = sync(api_client, cursor=cursor)['changes']
+    assert [change['deleted'] for change in changes] == [False, True]
+    assert changes[0]['user']['email'] == 'bulk@email.com'
+    assert UserTombstone.objects.get().user_id == users[2].id
+
+@pytest.mark.django_db
+def test_error_sync_invalid_cursor(api_client):
+    response = api_client.get(reverse('users_sync'), {'cursor': '-1'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'cursor' in response.data
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='checks SQLite query plans')
+def test_sync_queries_use_change_seq_indexes(users):
+    for model in (CustomUser, UserTombstone):
+        plan = model.objects.filter(change_seq__gt=1).order_by('change_seq')[:10].explain()
+        assert 'USING INDEX' in plan and '(change_seq>?)' in plan
+        assert 'TEMP B-TREE' not in plan
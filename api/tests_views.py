@@ -2,30 +2,11 @@ import json
 import pytest
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 
 CustomUser = get_user_model()
 
-@pytest.fixture
-def api_client():
-    return APIClient()
-
-@pytest.fixture
-def user_data():
-    return {
-        'name': 'Test User',
-        'email': 'testuser@email.com',
-        'password': '1TestPassword!',
-        'identity_number': '12345678901',
-        'date_of_birth': '2000-01-01'
-    }
-
-@pytest.fixture
-def create_user(user_data):
-    return CustomUser.objects.create_user(**user_data)
-
 @pytest.mark.django_db
 def test_get_user_list(api_client, create_user):
     # Authenticate the client
@@ -44,7 +25,58 @@ def test_get_user_list(api_client, create_user):
     serializer = UserSerializer(users, many=True)
     
     assert response.status_code == status.HTTP_200_OK
-    assert response.data == serializer.data
+    assert response.data['results'] == serializer.data
+    assert response.data['next'] is None
+
+@pytest.mark.django_db
+def test_get_user_list_cursor_pagination(api_client, create_user):
+    for i in range(4):
+        CustomUser.objects.create_user(
+            email=f'page{i}@email.com',
+            password='1TestPassword!',
+            name=f'Page User {i}',
+            identity_number=f'9000000000{i}',
+            date_of_birth='2000-01-01'
+        )
+
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Walk every page following the opaque next cursor
+    url = reverse('users') + '?page_size=2'
+    emails = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) <= 2
+        emails.extend(user['email'] for user in response.data['results'])
+        url = response.data['next']
+
+    expected = list(CustomUser.objects.order_by('id').values_list('email', flat=True))
+    assert emails == expected
+
+@pytest.mark.django_db
+def test_get_user_list_page_size_is_bounded(api_client, create_user, monkeypatch):
+    from .pagination import UserCursorPagination
+    CustomUser.objects.create_user(
+        email='testuser2@email.com',
+        password='1TestPassword!',
+        name='Test User 2',
+        identity_number='12345678902',
+        date_of_birth='2000-01-01'
+    )
+
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    monkeypatch.setattr(UserCursorPagination, 'max_page_size', 1)
+    response = api_client.get(reverse('users') + '?page_size=1000')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == 1
+    assert response.data['next'] is not None
 
 @pytest.mark.django_db
 def test_get_user_detail(api_client, create_user):
@@ -173,6 +205,18 @@ def test_delete_user(api_client, create_user):
     assert response.status_code == status.HTTP_204_NO_CONTENT
     assert CustomUser.objects.count() == 1
 
+@pytest.mark.django_db
+def test_error_user_detail_not_found(api_client, create_user):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Every method answers 404 for an id that does not exist
+    url = reverse('user', kwargs={'pk': create_user.id + 100})
+    assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+    assert api_client.put(url, {'name': 'Nobody'}).status_code == status.HTTP_404_NOT_FOUND
+    assert api_client.delete(url).status_code == status.HTTP_404_NOT_FOUND
+
 @pytest.mark.django_db
 def test_get_user_id(api_client, create_user):
     # Authenticate the client
@@ -215,4 +259,270 @@ def test_error_register_user(api_client):
     
     # Verify the response
     assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert CustomUser.objects.count() == 0
\ No newline at end of file
+    assert CustomUser.objects.count() == 0
+@pytest.mark.django_db
+def test_export_users_ndjson(api_client, create_user):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Make the request
+    response = api_client.get(reverse('users_export'))
+
+    # Verify the response
+    from .serializers import UserSerializer  # Import here to avoid circular import
+    lines = b''.join(response.streaming_content).decode().splitlines()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in lines] == [UserSerializer(create_user).data]
+
+@pytest.mark.django_db
+def test_export_users_csv(api_client, create_user):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Make the request
+    response = api_client.get(reverse('users_export') + '?type=csv')
+
+    # Verify the response
+    lines = b''.join(response.streaming_content).decode().splitlines()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'] == 'text/csv'
+    assert lines == [
+        'name,identity_number,email,date_of_birth',
+        'Test User,12345678901,testuser@email.com,2000-01-01',
+    ]
+
+@pytest.mark.django_db
+def test_error_export_users_type(api_client, create_user):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Make the request with an unknown export type
+    response = api_client.get(reverse('users_export') + '?type=xml')
+
+    # Verify the response
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_bulk_register_users(api_client, create_user):
+    # Authenticate the client as staff
+    create_user.is_staff = True
+    create_user.save()
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Prepare a batch with one valid record, one duplicate of an existing user,
+    # one duplicate inside the batch and one invalid record
+    records = [
+        {'name': 'Bulk 1', 'email': 'bulk1@email.com', 'password': '1TestPassword!',
+         'identity_number': '55500000001', 'date_of_birth': '2000-01-01'},
+        {'name': 'Bulk 2', 'email': 'testuser@email.com', 'password': '1TestPassword!',
+         'identity_number': '55500000002', 'date_of_birth': '2000-01-01'},
+        {'name': 'Bulk 3', 'email': 'bulk3@email.com', 'password': '1TestPassword!',
+         'identity_number': '55500000001', 'date_of_birth': '2000-01-01'},
+        {'name': 'Bulk 4', 'email': 'bulk4email.com', 'password': '1TestPassword!',
+         'identity_number': '55500000004', 'date_of_birth': '2000-01-01'},
+    ]
+
+    # Make the request
+    response = api_client.post(reverse('register_bulk'), records, format='json')
+
+    # Verify the response
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert response.data['created'] == 1
+    assert [error['index'] for error in response.data['errors']] == [1, 2, 3]
+    assert 'email' in response.data['errors'][0]['errors']
+    assert 'identity_number' in response.data['errors'][1]['errors']
+    assert 'email' in response.data['errors'][2]['errors']
+    assert CustomUser.objects.get(email='bulk1@email.com').check_password('1TestPassword!')
+
+@pytest.mark.django_db
+def test_error_bulk_register_not_a_list(api_client, create_user):
+    # Authenticate the client as staff
+    create_user.is_staff = True
+    create_user.save()
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    # Make the request with a single object instead of a list
+    response = api_client.post(reverse('register_bulk'), {'name': 'Test'}, format='json')
+
+    # Verify the response
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert CustomUser.objects.count() == 1
+
+@pytest.mark.django_db
+def test_error_bulk_register_requires_staff(api_client, create_user):
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    response = api_client.post(reverse('register_bulk'), [{
+        'name': 'Bulk 1', 'email': 'bulk1@email.com', 'password': '1TestPassword!',
+        'identity_number': '55500000001', 'date_of_birth': '2000-01-01',
+    }], format='json')
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert CustomUser.objects.count() == 1
+
+@pytest.mark.django_db
+def test_get_user_detail_not_modified(api_client, create_user, django_capture_on_commit_callbacks):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    url = reverse('user', kwargs={'pk': create_user.id})
+
+    # The first read hands out an ETag, repeating it gets a 304
+    etag = api_client.get(url)['ETag']
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response['ETag'] == etag
+
+    # Updating the user changes the ETag once the write commits
+    with django_capture_on_commit_callbacks(execute=True):
+        create_user.name = 'Updated Name'
+        create_user.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+    assert response.data['name'] == 'Updated Name'
+
+@pytest.mark.django_db
+def test_get_user_detail_served_from_response_cache(api_client, create_user, django_assert_num_queries):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    url = reverse('user', kwargs={'pk': create_user.id})
+    first = api_client.get(url)
+
+    # Neither the user lookup nor authentication touch the database on a repeat read
+    with django_assert_num_queries(0):
+        response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == first.data
+
+@pytest.mark.django_db
+def test_get_user_list_not_modified(api_client, create_user, django_capture_on_commit_callbacks):
+    # Authenticate the client
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    url = reverse('users')
+
+    etag = api_client.get(url)['ETag']
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Any new user invalidates every cached list page
+    with django_capture_on_commit_callbacks(execute=True):
+        CustomUser.objects.create_user(
+            email='testuser2@email.com',
+            password='1TestPassword!',
+            name='Test User 2',
+            identity_number='12345678902',
+            date_of_birth='2000-01-01'
+        )
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == 2
+
+@pytest.mark.django_db
+def test_user_row_serializer_matches_user_serializer(create_user):
+    from rest_framework.renderers import JSONRenderer
+    from .renderers import FastJSONRenderer
+    from .serializers import UserRowSerializer, UserSerializer  # Import here to avoid circular import
+    CustomUser.objects.create_user(
+        email='testuser2@email.com',
+        password='1TestPassword!',
+        name='Zoë\u2028"Quoted" 名前',
+        identity_number='12345678902',
+        date_of_birth='1999-12-31'
+    )
+
+    expected = JSONRenderer().render(UserSerializer(CustomUser.objects.order_by('id'), many=True).data)
+    rows = CustomUser.objects.order_by('id').values(*UserRowSerializer.fields)
+    data = UserRowSerializer().to_representation(rows)
+
+    assert JSONRenderer().render(data) == expected
+    assert FastJSONRenderer().render(data) == expected
+
+def test_fast_renderer_leaves_floats_to_json_renderer():
+    from decimal import Decimal
+    from rest_framework.renderers import JSONRenderer
+    from .renderers import FastJSONRenderer
+    data = {'large': 1e16, 'small': 0.1, 'nested': [{'value': Decimal('2.5')}]}
+
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    with pytest.raises(ValueError):
+        FastJSONRenderer().render({'value': float('nan')})
+    renderer = FastJSONRenderer()
+    renderer.strict = False
+    assert renderer.render({'value': float('inf')}) == b'{"value":Infinity}'
+
+@pytest.mark.django_db
+def test_sparse_fieldsets_limit_output_and_columns(api_client, create_user):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    api_client.get(reverse('users'))  # warm the auth cache
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse('users') + '?fields=email,name')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == [{'name': 'Test User', 'email': 'testuser@email.com'}]
+    [select] = [query['sql'] for query in queries if 'api_customuser' in query['sql']]
+    assert '"password"' not in select and '"identity_number"' not in select
+
+    url = reverse('user', kwargs={'pk': create_user.id})
+    response = api_client.get(url + '?fields=date_of_birth')
+    assert response.data == {'date_of_birth': '2000-01-01'}
+    full = api_client.get(url)
+    assert full.data['name'] == 'Test User'
+    assert full['ETag'] != response['ETag']
+
+@pytest.mark.django_db
+def test_error_sparse_fieldsets_reject_unlisted_fields(api_client, create_user):
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    for url in [reverse('users'), reverse('user', kwargs={'pk': create_user.id})]:
+        response = api_client.get(url + '?fields=name,password,is_staff')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'is_staff, password' in response.data['fields'][0]
+
+@pytest.mark.django_db
+def test_response_cache_invalidation_reaches_other_workers(
+        api_client, create_user, settings, tmp_path, django_capture_on_commit_callbacks):
+    # Two cache instances on one directory stand in for two gunicorn workers
+    settings.CACHES = {
+        **settings.CACHES,
+        'worker_a': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path)},
+        'worker_b': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path)},
+    }
+    token = RefreshToken.for_user(create_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    url = reverse('user', kwargs={'pk': create_user.id})
+
+    settings.USER_RESPONSE_CACHE_ALIAS = 'worker_a'
+    etag = api_client.get(url)['ETag']
+    settings.USER_RESPONSE_CACHE_ALIAS = 'worker_b'
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.put(url, {
+            'name': 'Updated Name', 'email': 'testuser@email.com',
+            'identity_number': '12345678901', 'date_of_birth': '2000-01-01',
+        })
+    assert response.status_code == status.HTTP_200_OK
+
+    settings.USER_RESPONSE_CACHE_ALIAS = 'worker_a'
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+    assert response.data['name'] == 'Updated Name'
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .writebehind import WriteBehindBuffer, last_login_buffer, record_login
+
+CustomUser = get_user_model()
+
+@pytest.fixture(autouse=True)
+def update_last_login(settings):
+    settings.SIMPLE_JWT = {**settings.SIMPLE_JWT, 'UPDATE_LAST_LOGIN': True}
+
+@pytest.fixture
+def users(make_user):
+    return [make_user(i, 'login') for i in range(3)]
+
+def login(user):
+    response = APIClient().post(reverse('token_obtain_pair'), {'email': user.email, 'password': '1TestPassword!'})
+    assert response.status_code == status.HTTP_200_OK
+
+@pytest.mark.django_db
+def test_login_buffers_last_login_until_flush(users, django_assert_num_queries):
+    login(users[0])
+    login(users[0])
+    login(users[1])
+
+    assert CustomUser.objects.filter(last_login__isnull=False).count() == 0
+    pending = last_login_buffer.pending()
+    assert set(pending) == {users[0].id, users[1].id}
+
+    with django_assert_num_queries(1):
+        assert last_login_buffer.flush() == 2
+    assert last_login_buffer.pending() == {}
+    users[0].refresh_from_db()
+    assert users[0].last_login == pending[users[0].id]
+
+@pytest.mark.django_db
+def test_login_leaves_last_login_alone_by_default(users, settings):
+    settings.SIMPLE_JWT = {**settings.SIMPLE_JWT, 'UPDATE_LAST_LOGIN': False}
+    login(users[0])
+
+    assert last_login_buffer.pending() == {}
+    assert CustomUser.objects.get(id=users[0].id).last_login is None
+
+@pytest.mark.django_db
+def test_record_login_sync_writes_immediately(users):
+    record_login(users[0])
+    record_login(users[0], sync=True)
+
+    assert last_login_buffer.pending() == {}
+    assert CustomUser.objects.get(id=users[0].id).last_login == users[0].last_login
+
+@pytest.mark.django_db
+def test_write_behind_can_be_turned_off(users, settings):
+    settings.LAST_LOGIN_WRITE_BEHIND = False
+    login(users[2])
+
+    assert last_login_buffer.pending() == {}
+    assert CustomUser.objects.get(id=users[2].id).last_login is not None
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_updates(users, monkeypatch):
+    buffer = WriteBehindBuffer('last_login', interval=None, max_size=10)
+    record_login(users[0], sync=True)
+    buffer.add(users[0].id, users[0].last_login)
+
+    def fail(batch):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(buffer, '_write', fail)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.pending() == {users[0].id: users[0].last_login}
+
+@pytest.mark.django_db(transaction=True)
+def test_size_threshold_flushes_in_the_background(users):
+    buffer = WriteBehindBuffer('last_login', interval=None, max_size=2)
+    for user in users[:2]:
+        record_login(user, sync=True)
+        buffer.add(user.id, user.last_login)
+
+    for _ in range(100):
+        if buffer.written == 2:
+            break
+        time.sleep(0.05)
+    assert buffer.written == 2
+    assert buffer.pending() == {}
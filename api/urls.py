@@ -1,12 +1,28 @@
 from django.urls import path
-from .views import RegisterView, UserDetailView, UserListView, get_user_id
+from . import async_views
+from .views import AvailabilityView, BulkRegisterView, LogoutAllView, LogoutView, RegisterView, UserBatchView, UserDetailView, UserExportView, UserListView, UserStatsView, UserSyncView, audit_stats, auth_cache_stats, get_user_id, hashing_stats
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
+    path('register/availability/', AvailabilityView.as_view(), name='register_availability'),
+    path('register/bulk/', BulkRegisterView.as_view(), name='register_bulk'),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('get_user_id/', get_user_id, name='get_user_id'),
     path('users/', UserListView.as_view(), name='users'),
+    path('users/export/', UserExportView.as_view(), name='users_export'),
+    path('users/batch/', UserBatchView.as_view(), name='users_batch'),
+    path('users/sync/', UserSyncView.as_view(), name='users_sync'),
+    path('users/stats/', UserStatsView.as_view(), name='users_stats'),
     path('user/<int:pk>/', UserDetailView.as_view(), name='user'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('logout/all/', LogoutAllView.as_view(), name='logout_all'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('stats/auth-cache/', auth_cache_stats, name='auth_cache_stats'),
+    path('stats/hashing/', hashing_stats, name='hashing_stats'),
+    path('stats/audit/', audit_stats, name='audit_stats'),
+    path('async/register/', async_views.register, name='async_register'),
+    path('async/get_user_id/', async_views.get_user_id, name='async_get_user_id'),
+    path('async/users/', async_views.user_list, name='async_users'),
+    path('async/user/<int:pk>/', async_views.user_detail, name='async_user'),
 ]
@@ -1,60 +1,243 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.shortcuts import get_object_or_404, render
+from .audit import audit_log, changed_fields
+from .authentication import CachedJWTAuthentication, user_cache
+from .availability import availability
+from .batch import BATCH_MAX_ITEMS, get_users, parse_ids, update_users
+from .bulk import bulk_register
+from .changes import sync_page
+from .conditional import cache_response, etag_matches, get_cached_response, list_etag, not_modified, user_etag
+from .db import retry_on_locked
+from .export import EXPORT_FORMATS
+from . import audit, demographics, hashing, sharding
+from .instrumentation import timed
 from .models import CustomUser
-from .serializers import RegisterSerializer, UserSerializer
+from .pagination import UserCursorPagination
+from .revocation import revocations
+from .search import filter_users, user_filters
+from .serializers import AvailabilitySerializer, RegisterSerializer, UserSerializer, row_serializer_for
 from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 
 # Create your views here.
 class RegisterView(APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
 
+    @retry_on_locked
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            user = serializer.save()
+            audit_log.publish(audit.REGISTER, user.id)
             return Response({'message': 'User registered successfully'}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+class AvailabilityView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        serializer = AvailabilitySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response({
+            field: not availability.is_taken(field, value) for field, value in serializer.validated_data.items()
+        })
+    
+class BulkRegisterView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    # Every record costs a full password hash, so only staff may register in bulk
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        records = request.data
+        if not isinstance(records, list) or not records:
+            return Response({'error': 'Expected a non-empty list of users'}, status=status.HTTP_400_BAD_REQUEST)
+        max_records = getattr(settings, 'BULK_REGISTER_MAX_RECORDS', 1000)
+        if len(records) > max_records:
+            return Response({'error': f'At most {max_records} users can be registered per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        created, errors = bulk_register(records, actor_id=request.user.id)
+        body = {
+            'created': created,
+            'errors': [{'index': index, 'errors': errors[index]} for index in sorted(errors)],
+        }
+        if not errors:
+            return Response(body, status=status.HTTP_201_CREATED)
+        if not created:
+            return Response(body, status=status.HTTP_400_BAD_REQUEST)
+        return Response(body, status=status.HTTP_207_MULTI_STATUS)
+
+class LogoutView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        refresh = None
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError as exc:
+                return Response({'refresh': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh[jwt_settings.USER_ID_CLAIM]) != str(request.user.pk):
+                return Response({'refresh': ['Token belongs to another user']}, status=status.HTTP_400_BAD_REQUEST)
+        revocations.revoke_token(request.auth)
+        if refresh is not None:
+            revocations.revoke_token(refresh)
+        return Response({'message': 'Logged out successfully'})
+
+class LogoutAllView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revocations.revoke_user(request.user.pk)
+        return Response({'message': 'Logged out of every session'})
+
+def user_list_page(request, view=None):
+    paginator = UserCursorPagination()
+    row_serializer = row_serializer_for(request.query_params)
+    filters = user_filters(request.query_params)
+    if sharding.enabled():
+        rows = paginator.paginate_shards(request, row_serializer.fields,
+                                         lambda queryset: filter_users(queryset, filters))
+        with timed('serialize'):
+            results = row_serializer.to_representation(rows)
+        return {'next': paginator.sharded_next, 'previous': None, 'results': results}
+    rows = filter_users(CustomUser.objects.all(), filters).values('id', *row_serializer.fields)
+    rows = paginator.paginate_queryset(rows, request, view=view)
+    with timed('serialize'):
+        results = row_serializer.to_representation(rows)
+    return paginator.get_paginated_response(results).data
+
 class UserListView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        users = CustomUser.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        etag = list_etag(request)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        data = get_cached_response(etag)
+        if data is None:
+            data = user_list_page(request, view=self)
+            cache_response(etag, data)
+        return Response(data, headers={'ETag': etag})
     
+class UserExportView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_FORMATS:
+            return Response({'type': f'Unsupported export type, expected one of: {", ".join(EXPORT_FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        stream, content_type = EXPORT_FORMATS[export_type]
+        response = StreamingHttpResponse(stream(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="users.{export_type}"'
+        return response
+
+class UserBatchView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        ids = parse_ids(request.query_params.get('ids', ''))
+        return Response({'results': get_users(ids, row_serializer_for(request.query_params))})
+
+    def patch(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list of users'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BATCH_MAX_ITEMS:
+            return Response({'error': f'At most {BATCH_MAX_ITEMS} users can be updated per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        results = update_users(items, row_serializer_for(request.query_params), actor_id=request.user.id)
+        updated = sum(result['status'] == status.HTTP_200_OK for result in results)
+        if updated == len(results):
+            return Response({'results': results})
+        if not updated:
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results}, status=status.HTTP_207_MULTI_STATUS)
+
+class UserSyncView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(sync_page(request.query_params, row_serializer_for(request.query_params)))
+
+class UserStatsView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(demographics.summary(request.query_params))
+
 class UserDetailView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request, pk):
-        user = CustomUser.objects.get(id=pk)
-        serializer = UserSerializer(user)
-        return Response(serializer.data)
+        row_serializer = row_serializer_for(request.query_params)
+        etag = user_etag(pk, request.query_params.get('fields'))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        data = get_cached_response(etag)
+        if data is None:
+            row = get_object_or_404(CustomUser.objects.values(*row_serializer.fields), id=pk)
+            with timed('serialize'):
+                data = row_serializer.to_representation([row])[0]
+            cache_response(etag, data)
+        return Response(data, headers={'ETag': etag})
     
+    @retry_on_locked
     def put(self, request, pk):
-        user = CustomUser.objects.get(id=pk)
+        user = get_object_or_404(CustomUser, id=pk)
         serializer = UserSerializer(user, data=request.data)
         if serializer.is_valid():
+            fields = changed_fields(user, serializer.validated_data)
             serializer.save()
+            audit_log.publish(audit.UPDATE, pk, actor_id=request.user.id, fields=fields)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @retry_on_locked
     def delete(self, request, pk):
-        user = CustomUser.objects.get(id=pk)
+        user = get_object_or_404(CustomUser, id=pk)
         user.delete()
+        audit_log.publish(audit.DELETE, pk, actor_id=request.user.id)
         return Response({'message': 'User deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication]) 
+@authentication_classes([CachedJWTAuthentication]) 
 def get_user_id(request):
     user_id = request.user.id
-    return JsonResponse({'user_id': user_id})
\ No newline at end of file
+    return JsonResponse({'user_id': user_id})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@authentication_classes([CachedJWTAuthentication])
+def auth_cache_stats(request):
+    return JsonResponse(user_cache.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@authentication_classes([CachedJWTAuthentication])
+def hashing_stats(request):
+    return JsonResponse(hashing.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@authentication_classes([CachedJWTAuthentication])
+def audit_stats(request):
+    return JsonResponse(audit_log.stats())
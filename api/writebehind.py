@@ -0,0 +1,122 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import sharding
+from .db import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces updates of one CustomUser column per user in memory and writes
+    them in batched UPDATEs from a background thread, every `interval` seconds
+    or as soon as `max_size` users are pending. Later values replace earlier
+    ones, so a user who logs in many times between flushes costs one row.
+    """
+
+    def __init__(self, field, interval, max_size):
+        self.field = field
+        self.interval = interval
+        self.max_size = max_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flushes = 0
+        self.written = 0
+
+    def add(self, user_id, value):
+        with self._lock:
+            self._pending[user_id] = value
+            full = len(self._pending) >= self.max_size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def discard(self, user_id):
+        with self._lock:
+            self._pending.pop(user_id, None)
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def _ensure_thread(self):
+        # A forked worker does not inherit the parent's thread, so start one per process
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.field}', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('Flushing %s updates failed', self.field)
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        """Write every pending update now, in the calling thread. Returns the number of users written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+            except Exception:
+                # Put the values back unless a newer one arrived meanwhile
+                with self._lock:
+                    self._pending = {**batch, **self._pending}
+                raise
+            self.flushes += 1
+            self.written += len(batch)
+            return len(batch)
+
+    @retry_on_locked
+    def _write(self, batch):
+        from .models import CustomUser
+        by_db = {}
+        for user_id, value in batch.items():
+            alias = sharding.shard_for_id(user_id) if sharding.enabled() else None
+            by_db.setdefault(alias, []).append(CustomUser(id=user_id, **{self.field: value}))
+        for alias, users in by_db.items():
+            CustomUser.objects.using(alias).bulk_update(users, [self.field])
+
+
+last_login_buffer = WriteBehindBuffer(
+    'last_login',
+    interval=getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 5.0),
+    max_size=getattr(settings, 'LAST_LOGIN_FLUSH_SIZE', 1000),
+)
+atexit.register(last_login_buffer.flush)
+
+
+def record_login(user, sync=False):
+    """
+    Set `user.last_login` to now and persist it through the write-behind
+    buffer, or immediately when `sync` is set or LAST_LOGIN_WRITE_BEHIND is off.
+    """
+    user.last_login = timezone.now()
+    if sync or not getattr(settings, 'LAST_LOGIN_WRITE_BEHIND', True):
+        last_login_buffer.discard(user.pk)
+        user.save(update_fields=['last_login'])
+        return
+    last_login_buffer.add(user.pk, user.last_login)
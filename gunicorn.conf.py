@@ -0,0 +1,54 @@
+"""
+gunicorn settings, read automatically from the working directory:
+
+    gunicorn project.wsgi
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn project.asgi
+
+The application is imported once in the master and forked into the workers,
+so its modules are shared copy-on-write. Because of that, HUP only restarts
+workers on the loaded code; deploy new code with USR2 (start a new master)
+followed by QUIT to the old one. Every value can be set from the environment.
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings_production')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 0)) or multiprocessing.cpu_count() * 2 + 1
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+preload_app = True
+
+# Recycle each worker after this many requests, staggered so they do not all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Worker heartbeat files on tmpfs, so a slow container filesystem cannot stall them
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR') or ('/dev/shm' if os.path.isdir('/dev/shm') else None)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def when_ready(server):
+    # Runs in the master before the first fork, so every worker starts with the index loaded
+    from api.availability import availability
+    availability.warm()
+
+
+def pre_fork(server, worker):
+    # A SQLite connection must not be shared across fork; workers open their own
+    from django.db import connections
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    # Recycled and stopped workers write out what they still buffer
+    from api.audit import audit_log
+    from api.writebehind import last_login_buffer
+    last_login_buffer.flush()
+    audit_log.close()
@@ -43,7 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.TokenUserIdMiddleware',
+    'api.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,15 +57,118 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        'api.authentication.CachedJWTAuthentication',
      ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated'
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 AUTH_USER_MODEL = 'api.CustomUser'
 
+SIMPLE_JWT = {
+    # With UPDATE_LAST_LOGIN on, logins write last_login through the write-behind buffer
+    'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.LoginSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.RefreshSerializer',
+}
+
+# Registration availability index: a Bloom filter over stored emails and
+# identity numbers, refreshed from the change sequence every sync interval seconds
+REGISTRATION_AVAILABILITY_SYNC_INTERVAL = 1.0
+REGISTRATION_AVAILABILITY_CAPACITY = 100000
+REGISTRATION_AVAILABILITY_ERROR_RATE = 0.01
+
+# Token revocation: revoked jtis and users are pulled into each process every
+# sync interval seconds and checked in memory behind a Bloom filter; entries
+# of expired tokens are dropped every compact interval seconds
+TOKEN_REVOCATION_SYNC_INTERVAL = 1.0
+TOKEN_REVOCATION_COMPACT_INTERVAL = 3600
+TOKEN_REVOCATION_BLOOM_CAPACITY = 100000
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = 0.001
+
+# Write-behind buffer for last_login when SIMPLE_JWT's UPDATE_LAST_LOGIN is on:
+# coalesced per user, flushed in batches every interval seconds, once this many
+# users are pending, and at exit
+LAST_LOGIN_WRITE_BEHIND = True
+LAST_LOGIN_FLUSH_INTERVAL = 5.0
+LAST_LOGIN_FLUSH_SIZE = 1000
+
+# Audit trail of register, update and delete events: queued in memory and
+# written by a background thread in batches of up to batch size events, each
+# at most flush interval seconds after it was queued, and at exit. A full
+# queue blocks publishers for up to the enqueue timeout, then drops the event
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_FLUSH_INTERVAL = 1.0
+AUDIT_BATCH_SIZE = 500
+AUDIT_ENQUEUE_TIMEOUT = 0.05
+
+# Cursor pagination for the user list endpoint
+USER_LIST_PAGE_SIZE = 50
+USER_LIST_MAX_PAGE_SIZE = 500
+
+# Lower bounds of the age bands reported by the user stats endpoint, after the band starting at 0
+USER_STATS_AGE_BANDS = [18, 25, 35, 45, 55, 65]
+
+# Ids or items accepted per request by the batch user endpoint
+USER_BATCH_MAX_ITEMS = 500
+
+# Changes returned per page by the user sync endpoint
+USER_SYNC_PAGE_SIZE = 500
+USER_SYNC_MAX_PAGE_SIZE = 5000
+
+# Rows fetched per database round trip by the streaming user export
+USER_EXPORT_CHUNK_SIZE = 2000
+
+# Bulk registration: records per request, rows per insert transaction
+BULK_REGISTER_MAX_RECORDS = 1000
+BULK_REGISTER_BATCH_SIZE = 500
+
+# Password hashing pool: processes (defaults to the number of cores), hashing calls in flight per
+# request worker (defaults to 4 per process), seconds to wait for a slot before answering 503, and
+# an optional PBKDF2 iteration count that existing hashes are upgraded to on login
+PASSWORD_HASHING_WORKERS = None
+PASSWORD_HASHING_QUEUE_SIZE = None
+PASSWORD_HASHING_QUEUE_TIMEOUT = 5
+PASSWORD_HASHING_ITERATIONS = None
+
+# Per-process cache of users resolved from JWTs, optionally backed by a shared Django cache alias
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_ALIAS = None
+
+# Serve get_user_id from verified token claims only, caching tokens that already passed verification
+GET_USER_ID_FROM_TOKEN = True
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+VERIFIED_TOKEN_CACHE_TTL = 300
+
+# ETag versions and cached payloads for user reads
+USER_RESPONSE_CACHE_ALIAS = 'default'
+USER_RESPONSE_CACHE_TTL = 300
+
+# Share of requests measured by PerformanceMiddleware, and repeats of one SQL statement reported as N+1
+PERFORMANCE_SAMPLE_RATE = 0.1
+PERFORMANCE_N_PLUS_ONE_THRESHOLD = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -87,13 +193,67 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# WAL lets readers run alongside the single writer; the pragmas trade a little durability on power
+# loss (synchronous=NORMAL) for far fewer fsyncs, and give each connection a 64 MB page cache and
+# 256 MB of memory-mapped reads. IMMEDIATE transactions take the write lock up front, so they wait
+# on `timeout` instead of failing with "database is locked" when upgrading from a read lock.
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA cache_size=-64000;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# CustomUser shards, only used once listed in USER_SHARDS. Users live on USER_SHARDS[id % len(USER_SHARDS)];
+# 'default' keeps the id sequence and the email/identity_number directory. Create the shard tables with
+# `manage.py migrate --database shard0` (and so on) before enabling.
+for index in range(2):
+    DATABASES[f'shard{index}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.shard{index}.sqlite3',
+    }
+
+USER_SHARDS = []
+
+# Read replicas: aliases from DATABASES that serve reads while writes go to 'default'. For SQLite,
+# add file copies such as {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.replica1.sqlite3',
+# 'TEST': {'MIRROR': 'default'}} and refresh them with `manage.py sync_replicas`.
+DATABASE_ROUTERS = ['api.sharding.ShardRouter', 'api.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_SELECTOR = 'api.routers.RoundRobinSelector'
+REPLICA_PIN_SECONDS = 5
+
+# Retries for writes that still hit "database is locked", with exponential backoff from this base delay
+DATABASE_LOCKED_RETRIES = 3
+DATABASE_LOCKED_BACKOFF = 0.05
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+
+PASSWORD_HASHERS = [
+    'api.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,49 @@
+"""
+Production settings: the development settings with DEBUG off and the
+deployment specifics read from the environment. Used by gunicorn.conf.py.
+"""
+
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DEBUG = False
+
+# Signs the JWTs; the development key is public, so there is no fallback
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY to run with the production settings.')
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+
+# Path of the default SQLite database, e.g. a mounted volume
+if os.environ.get('DJANGO_DB_PATH'):
+    DATABASES['default']['NAME'] = os.environ['DJANGO_DB_PATH']
+
+# ETag versions and cached responses must be shared by every gunicorn worker,
+# otherwise a write on one worker leaves the others serving the old body.
+# Any shared backend works; point LOCATION at Redis or Memcached to span hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'user-api-cache')),
+    },
+}
+
+# Password hashing. gunicorn already runs about two processes per core, so by
+# default there is no hashing process pool here: each hash runs in its request
+# thread, and bulk registration hashes its records one after another. What is
+# kept is the backpressure: a worker hashes on fewer threads than it has, so a
+# burst of logins always leaves it a thread for other requests, and a login
+# that finds every hashing slot taken gets a 503 after a short wait. Set
+# PASSWORD_HASHING_WORKERS to give each worker a pool when cores are spare,
+# e.g. with fewer GUNICORN_WORKERS.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 1))
+PASSWORD_HASHING_QUEUE_SIZE = max(1, int(os.environ.get('GUNICORN_THREADS', 2)) - 1)
+PASSWORD_HASHING_QUEUE_TIMEOUT = 0.5
+# Without a pool a bulk registration hashes serially, and must finish within GUNICORN_TIMEOUT
+BULK_REGISTER_MAX_RECORDS = int(os.environ.get('BULK_REGISTER_MAX_RECORDS', 50))